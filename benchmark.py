@@ -0,0 +1,329 @@
+#    Copyright (C) 2008 Vasco Costa <vasco dot costa at geekslot dot com>
+#
+#    This file is part of sbs1explorer.
+#
+#    sbs1explorer is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    sbs1explorer is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Benchmarks of the application.
+
+This module times the application and writes the timings to the standard
+output as a JSON object, so that the results of different versions can be
+compared. Each timing is the best of a number of runs, in seconds.
+
+The startup benchmarks run each statement in a fresh interpreter and subtract
+the time an interpreter takes to start doing nothing, those needing wxPython or
+a display are skipped when they can't run.
+
+The database benchmarks run on a synthetic database with the BaseStation
+schema, generated from a seed so that it's the same on every run. Countries,
+type codes and operators are drawn from skewed distributions, the countries and
+type codes from the constants module, so that common and rare values are both
+searched. They time finding and searching records, with and without the side-car
+indexes, rendering the results, and ingesting messages. The results searched
+with the side-car indexes must be those found by SQLite alone, otherwise the
+differing searches are listed and the benchmark fails.
+
+Usage: python benchmark.py [options]
+
+"""
+
+import bisect
+import datetime
+import json
+import os
+import random
+import shutil
+import sqlite3
+import string
+import subprocess
+import sys
+import tempfile
+import time
+from optparse import OptionParser
+
+import business
+import config
+import constants
+import ingest
+import mbiz
+import sbs1query
+
+
+STARTUP = (('import_sbs1explorer', 'import sbs1explorer'),
+           ('import_business', 'import business'),
+           ('import_constants', 'import constants'),
+           ('import_gui', 'import gui'),
+           ('main_window', 'import wx, gui; app = wx.PySimpleApp(); gui.MainWindow(None, -1, gui.PROGRAM_NAME).Destroy()'))
+
+FLIGHTS_PER_AIRCRAFT = 50
+OPERATORS = 500
+SQUAWKS = 500
+EMERGENCY_SQUAWKS = ((7700, 0.0005), (7600, 0.0002), (7500, 0.0001))
+ALERT_RATE = 0.01
+EMERGENCY_RATE = 0.001
+SPI_RATE = 0.005
+NO_CALLSIGN_RATE = 0.05
+START = datetime.datetime(2008, 1, 1)
+SECONDS_PER_FLIGHT = 30
+INGEST_MESSAGES = 100000
+
+
+class Skewed:
+
+    """Class drawing values with a Zipf like distribution, the first ones being the most frequent."""
+
+    def __init__(self, values, generator):
+        """Initialize the distribution by setting its values, weighted by the inverse of their rank, and its generator."""
+        self.values = values
+        self.generator = generator
+        self.cumulative = []
+        total = 0.0
+        for rank in range(1, len(values) + 1):
+            total += 1.0 / rank
+            self.cumulative.append(total)
+
+    def draw(self):
+        """Return a value drawn from the distribution."""
+        return self.values[bisect.bisect(self.cumulative, self.generator.random() * self.cumulative[-1])]
+
+
+def generate(database_path, flights, seed=0):
+    """Generate a synthetic database with the given number of flights."""
+    generator = random.Random(seed)
+    countries = list(constants.COUNTRIES)
+    generator.shuffle(countries)
+    countries = Skewed(countries, generator)
+    type_codes = list(constants.ICAO_TYPE_CODES)
+    generator.shuffle(type_codes)
+    type_codes = Skewed(type_codes, generator)
+    operators = Skewed(generator.sample([a + b + c for a in string.ascii_uppercase for b in string.ascii_uppercase
+                                         for c in string.ascii_uppercase], OPERATORS), generator)
+    squawks = [int(oct(code)) for code in generator.sample(xrange(1, 4096), SQUAWKS)]
+    model = mbiz.Model(database_path, name='Flights', primary_key='flightid')
+    try:
+        for sql_statement in business.SCHEMA:
+            model.raw_sql(sql_statement)
+        aircraft = max(1, flights / FLIGHTS_PER_AIRCRAFT)
+        def aircraft_rows():
+            for aircraft_id, modes in zip(xrange(1, aircraft + 1), generator.sample(xrange(1, 0x1000000), aircraft)):
+                country = countries.draw()
+                registration = country[:2].upper() + '-' + ''.join([generator.choice(string.ascii_uppercase) for index in range(3)])
+                yield (aircraft_id, '%06X' % modes, country, registration, type_codes.draw(), operators.draw())
+        model.write_many(('AircraftID', 'ModeS', 'ModeSCountry', 'Registration', 'ICAOTypeCode', 'OperatorFlagCode'),
+                         aircraft_rows(), 'Aircraft')
+        aircraft_ids = Skewed(range(1, aircraft + 1), generator)
+        def flight_rows():
+            for flight_id in xrange(1, flights + 1):
+                start = START + datetime.timedelta(seconds=flight_id * SECONDS_PER_FLIGHT + generator.randint(0, SECONDS_PER_FLIGHT - 1))
+                end = start + datetime.timedelta(seconds=generator.randint(60, 3 * 3600))
+                callsign = None
+                if generator.random() >= NO_CALLSIGN_RATE:
+                    callsign = operators.draw() + str(generator.randint(1, 9999))
+                first_squawk = last_squawk = generator.choice(squawks)
+                chance = generator.random()
+                for squawk, rate in EMERGENCY_SQUAWKS:
+                    if chance < rate:
+                        first_squawk = last_squawk = squawk
+                        break
+                    chance -= rate
+                yield (flight_id, 1, aircraft_ids.draw(), start.strftime('%Y-%m-%d %H:%M:%S'), end.strftime('%Y-%m-%d %H:%M:%S'),
+                       callsign, first_squawk, last_squawk, generator.random() < ALERT_RATE, generator.random() < EMERGENCY_RATE,
+                       generator.random() < SPI_RATE)
+        model.write_many(business.IngestController.flight_fields, flight_rows())
+    finally:
+        model.close()
+
+
+def profile(database_path):
+    """Return the search data of the benchmarks, made of the most frequent values of the given database."""
+    model = mbiz.Model(database_path, name='Flights', primary_key='flightid', read_only=True)
+    try:
+        values = {}
+        for field, table in (('operatorflagcode', 'Aircraft'), ('modescountry', 'Aircraft'), ('icaotypecode', 'Aircraft'),
+                             ('registration', 'Aircraft'), ('callsign', 'Flights')):
+            model.raw_sql('SELECT ' + field + ' FROM ' + table + ' WHERE ' + field + ' IS NOT NULL GROUP BY ' + field +
+                          ' ORDER BY count(*) DESC LIMIT 1')
+            values[field] = model[0][0]
+    finally:
+        model.close()
+    return (('callsign', {'callsign': values['callsign']}),
+            ('callsign_prefix', {'callsign': values['operatorflagcode'] + '1%'}),
+            ('callsign_substring', {'callsign': '%' + values['callsign'][3:] + '%'}),
+            ('registration_suffix', {'registration': '%' + values['registration'][-2:]}),
+            ('operator', {'operatorflagcode': values['operatorflagcode']}),
+            ('country', {'modescountry': values['modescountry']}),
+            ('type', {'icaotypecode': values['icaotypecode']}),
+            ('emergency', {'firstsquawk': '7700'}),
+            ('alert_by_country', {'hadalert': '1', 'modescountry': values['modescountry']}))
+
+
+def search_data(criteria):
+    """Return the search data of the main window for the given criteria."""
+    data = {}
+    for name, field in sbs1query.OPTIONS:
+        data[field] = u''
+    data.update(criteria)
+    return data
+
+
+def database(database_path, repeat):
+    """Time finding, searching and rendering records of the given database."""
+    results = {}
+    searches = profile(database_path)
+    aircraft_controller = business.AircraftController(database_path)
+    try:
+        for name, criteria in searches:
+            results['find_' + name] = best(lambda: timed(lambda: aircraft_controller.model.find(aircraft_controller.fields, criteria)), repeat)
+        variants = (('sqlite', False, False, None),
+                    ('fulltext', False, True, lambda: [table for table in business.FullTextController(database_path).update()]),
+                    ('snapshot', True, False, aircraft_controller.build_snapshot))
+        found = {} # the results of each variant and search, which must be those of sqlite
+        snapshot, fulltext = config.SNAPSHOT, config.FULLTEXT
+        try:
+            for variant, config.SNAPSHOT, config.FULLTEXT, build in variants:
+                if build != None:
+                    results['build_' + variant] = timed(build)
+                for name, criteria in searches:
+                    def search():
+                        business.cache.clear()
+                        return timed(lambda: aircraft_controller.search(search_data(criteria)))
+                    results['search_' + variant + '_' + name] = best(search, repeat)
+                    found[variant, name] = tuple(aircraft_controller.model)
+        finally:
+            config.SNAPSHOT, config.FULLTEXT = snapshot, fulltext
+        results['mismatches'] = sorted([variant + '_' + name for (variant, name), rows in found.items() if rows != found['sqlite', name]])
+        aircraft_controller.model.find(aircraft_controller.fields, None)
+        rows = list(aircraft_controller.model)
+    finally:
+        aircraft_controller.close()
+    null = open(os.devnull, 'w')
+    try:
+        for format in ('csv', 'jsonl'):
+            results['render_' + format] = best(lambda: timed(lambda: sbs1query.Writer(null, format, False).write(1, rows)), repeat)
+    finally:
+        null.close()
+    results['rows_rendered'] = len(rows)
+    return results
+
+
+def ingestion(repeat, seed=0):
+    """Time parsing and ingesting synthetic messages."""
+    generator = random.Random(seed)
+    aircraft = ['%06X' % modes for modes in generator.sample(xrange(1, 0x1000000), INGEST_MESSAGES / 100)]
+    lines = []
+    for index in xrange(INGEST_MESSAGES):
+        kind = generator.randint(1, 8)
+        callsign = ''
+        if kind == 1:
+            callsign = 'TAP' + str(generator.randint(1, 9999))
+        squawk = ''
+        if kind == 6:
+            squawk = str(generator.choice((7700, 1234, 2000)))
+        lines.append('MSG,' + str(kind) + ',1,1,' + generator.choice(aircraft) + ',1,2008/01/01,12:00:00.000,2008/01/01,12:00:00.000,' +
+                     callsign + ',35000,,,,,,' + squawk + ',0,0,0,0\r\n')
+    results = {'ingest_messages': INGEST_MESSAGES}
+    results['parse'] = best(lambda: timed(lambda: [ingest.parse(line) for line in lines]), repeat)
+    messages = [ingest.parse(line) for line in lines]
+    def apply():
+        directory = tempfile.mkdtemp()
+        try:
+            ingest_controller = business.IngestController(os.path.join(directory, 'ingest.sqb'))
+            try:
+                return timed(lambda: [ingest_controller.apply(message) for message in messages] and ingest_controller.flush())
+            finally:
+                ingest_controller.close()
+        finally:
+            mbiz.pool.close()
+            shutil.rmtree(directory)
+    results['ingest'] = best(apply, repeat)
+    return results
+
+
+def timed(function):
+    """Return the wall time, in seconds, of calling the given function."""
+    start = time.time()
+    function()
+    return time.time() - start
+
+
+def run(statement):
+    """Return the wall time, in seconds, of running the given statement in a fresh interpreter, None if it fails."""
+    null = open(os.devnull, 'w')
+    try:
+        start = time.time()
+        status = subprocess.call([sys.executable, '-c', statement], cwd=os.path.dirname(os.path.abspath(__file__)), stdout=null, stderr=null)
+        stop = time.time()
+    finally:
+        null.close()
+    if status != 0:
+        return None
+    return stop - start
+
+
+def best(function, repeat):
+    """Return the best of the times returned by calling the given function repeat times, None if any is None."""
+    times = [function() for index in range(repeat)]
+    if None in times:
+        return None
+    return min(times)
+
+
+def startup(repeat):
+    """Time the startup of the application."""
+    results = {}
+    interpreter = best(lambda: run('pass'), repeat)
+    results['interpreter'] = interpreter
+    for name, statement in STARTUP:
+        seconds = best(lambda: run(statement), repeat)
+        if seconds != None:
+            results[name] = max(0.0, seconds - interpreter)
+    return results
+
+
+def main():
+    option_parser = OptionParser(usage='%prog [options]')
+    option_parser.add_option('-r', '--repeat', type='int', default=5, help='number of runs of each benchmark [default: %default]')
+    option_parser.add_option('-n', '--flights', type='int', default=100000, help='number of flights of the synthetic database [default: %default]')
+    option_parser.add_option('-s', '--seed', type='int', default=0, help='seed of the synthetic data [default: %default]')
+    option_parser.add_option('-d', '--database', help='generate the synthetic database at DATABASE and keep it, or use it if it exists')
+    option_parser.add_option('-b', '--benchmarks', default='startup,database,ingest', help='comma separated benchmarks run [default: %default]')
+    options, arguments = option_parser.parse_args()
+    benchmarks = options.benchmarks.split(',')
+    results = {'python': sys.version.split()[0], 'sqlite': sqlite3.sqlite_version, 'flights': options.flights, 'seed': options.seed}
+    if 'startup' in benchmarks:
+        results['startup'] = startup(options.repeat)
+    if 'database' in benchmarks:
+        directory = None
+        database_path = options.database
+        if database_path == None:
+            directory = tempfile.mkdtemp()
+            database_path = os.path.join(directory, 'BaseStation.sqb')
+        try:
+            if not os.path.exists(database_path):
+                results['generate'] = timed(lambda: generate(database_path, options.flights, options.seed))
+            results['database'] = database(database_path, options.repeat)
+        finally:
+            mbiz.pool.close()
+            if directory != None:
+                shutil.rmtree(directory)
+    if 'ingest' in benchmarks:
+        results['ingest'] = ingestion(options.repeat, options.seed)
+    print json.dumps(results, indent=4, sort_keys=True)
+    if len(results.get('database', {}).get('mismatches', [])) != 0:
+        sys.exit('results differing from those of sqlite: ' + ', '.join(results['database']['mismatches']))
+
+
+if __name__ == '__main__':
+    main()
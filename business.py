@@ -27,17 +27,48 @@ All the classes are derived from the base ones found on the mbiz module.
 Classes:
 
 Aircraft - class representing aircraft objects.
+Flight - class representing flight objects.
 AircraftController - class representing business rules.
+ArchiveController - class representing the business rules of archives of many databases.
+Search - class representing searches run in the background.
+SuggestionController - class representing the suggestions for the search fields.
+StatisticsController - class representing the statistics of the flights.
+FullTextController - class representing the full text index of the pattern searches.
+RollupController - class representing the sums of flights reports query.
+IngestController - class representing the ingestion of SBS-1 messages.
 
 Exceptions:
 
 DatabaseError - exception representing database errors.
 
+Functions:
+
+archive - return the paths of the databases of an archive.
+restore - return the object pickled in a file.
+seconds - return the seconds since the epoch of the time of a message.
+store - pickle an object to a file.
+submit - start a search in the background.
+version - return the version of a database.
+weigh - return an estimate of the bytes taken by rows.
+
 """
 
 import os
+import calendar
+import collections
+import cPickle
+import glob
+import heapq
+import itertools
+import multiprocessing.pool
+import shutil
 import sys
+import threading
+import time
+import Queue
 
+import config
+import lookup
 import mbiz
 
 
@@ -47,40 +78,232 @@ class Aircraft(mbiz.Model):
 
     def __init__(self, database_path):
         """Initialize the Aircraft model by calling the __init__ method of the parent class."""
-        mbiz.Model.__init__(self, database_path, child='FLights', primary_key='aircraftid', foreign_key='aircraftid')
+        mbiz.Model.__init__(self, database_path, child='FLights', primary_key='aircraftid', foreign_key='aircraftid', read_only=True)
+
+
+class Flight(mbiz.Model):
+
+    """Flight model derived from Model."""
+
+    def __init__(self, database_path, read_only=True):
+        """Initialize the Flight model by calling the __init__ method of the parent class."""
+        mbiz.Model.__init__(self, database_path, name='Flights', primary_key='flightid', read_only=read_only)
 
 
 class AircraftController(mbiz.Controller):
 
     """AircraftController controller derived from Controller."""
 
-    def __init__(self, database_path):
-        """Initialize the AircraftController controller by calling the __init__ method of the parent class."""
-        mbiz.Controller.__init__(self, Aircraft(database_path))
-
-    def search(self, data):
-        """Search the Aircraft model for the given data."""
-        fields = ('starttime',
-                  'firstsquawk',
-                  'callsign',
-                  'hadalert',
-                  'hademergency',
-                  'hadspi', 'modes',
+    fields = ('starttime',
+              'firstsquawk',
+              'callsign',
+              'hadalert',
+              'hademergency',
+              'hadspi', 'modes',
+              'registration',
+              'icaotypecode',
+              'operatorflagcode',
+              'modescountry')
+    order = 'FLights.flightid'
+    searchable = ('callsign',
+                  'modes',
                   'registration',
+                  'firstsquawk',
                   'icaotypecode',
                   'operatorflagcode',
                   'modescountry')
+
+    def __init__(self, database_path, order=None):
+        """Initialize the AircraftController controller by calling the __init__ method of the parent class.
+
+        The results are found in the given order, by flight id if None, and otherwise end with the value they're ordered by.
+
+        """
+        try:
+            mbiz.Controller.__init__(self, Aircraft(database_path))
+        except mbiz.DatabaseError, e:
+            raise DatabaseError(e.message)
+        self.federated = ()
+        if order != None:
+            self.order = order
+            self.fields = self.fields + (order,)
+
+    def search(self, data, after=None):
+        """Search the Aircraft model for the page of results of the given data following the given flight id."""
+        key = self.key(data, after)
+        results = cache.get(key)
+        if results == None:
+            results = self.find_snapshot(data, after)
+        if results != None:
+            self.model[:] = results[0]
+            self.model.last_key = results[1]
+        else:
+            self.fulltext()
+            try:
+                self.model.find_page(self.fields, self.criteria(data), self.order, after, config.LIMIT)
+            except mbiz.DatabaseError, e:
+                raise DatabaseError(e.message)
+            cache.put(key, (tuple(self.model), self.model.last_key), weigh(self.model))
+        self.set(self, 'results', self.model)
+        self.set(self, 'last_key', self.model.last_key)
+        self.set(self, 'more', len(self.model) == config.LIMIT)
+
+    def search_iter(self, data, size=config.PAGE_SIZE, after=None):
+        """Search the Aircraft model like search does but yield the results in pages of at most size records."""
+        key = self.key(data, after)
+        results = cache.get(key)
+        if results == None:
+            results = self.find_snapshot(data, after)
+        if results != None:
+            for index in range(0, len(results[0]), size):
+                yield list(results[0][index:index + size])
+            self.set(self, 'last_key', results[1])
+            self.set(self, 'more', len(results[0]) == config.LIMIT)
+            return
+        self.fulltext()
+        results = []
+        count = 0
+        weight = 0
+        try:
+            for page in self.model.find_iter(self.fields, self.criteria(data), config.LIMIT, size, self.order, after):
+                count += len(page)
+                if results != None:
+                    weight += weigh(page)
+                    if weight <= cache.size:
+                        results.extend(page)
+                    else:
+                        results = None
+                yield page
+        except mbiz.DatabaseError, e:
+            raise DatabaseError(e.message)
+        self.set(self, 'last_key', self.model.last_key)
+        self.set(self, 'more', count == config.LIMIT)
+        if results != None:
+            cache.put(key, (tuple(results), self.model.last_key), weight)
+
+    def key(self, data, after=None):
+        """Return the results cache key for the given data and page, dropping the results cached for older database versions."""
+        database_path = os.path.abspath(self.model.database_path)
+        version = self.version()
+        if versions.get(database_path, version) != version:
+            cache.remove(lambda key: key[0] == database_path and key[1] != version)
+        versions[database_path] = version
+        criteria = self.criteria(data)
+        if criteria != None:
+            criteria = tuple(sorted(criteria.items()))
+        return (database_path, version, self.federated, self.order, criteria, after)
+
+    def version(self):
+        """Return the version of the database, and of those federated with it, which changes whenever they're written."""
+        return version(self.model.database_path) + tuple([version(database_path) for database_path in self.federated])
+
+    def federate(self, database_paths, order):
+        """Search the given databases along with the database of the controller, in the given order."""
+        try:
+            self.model.federate(database_paths)
+        except mbiz.DatabaseError, e:
+            raise DatabaseError(e.message)
+        self.federated = tuple([os.path.abspath(database_path) for database_path in database_paths])
+        self.order = order
+
+    def fulltext(self):
+        """Search the patterns of the fields in the full text index through it if it's up to date, with LIKE otherwise."""
+        self.model.patterns = {}
+        path = self.model.database_path + '.fts'
+        if not config.FULLTEXT or not os.path.exists(path):
+            return
+        try:
+            self.model.attach(path, 'fulltext')
+            self.model.raw_sql("SELECT value FROM fulltext.state WHERE name = 'version'")
+        except mbiz.DatabaseError:
+            return
+        if len(self.model) != 0 and self.model[0][0] == repr(self.version()):
+            self.model.patterns = dict(FullTextController.patterns)
+
+    def build_snapshot(self, size=config.PAGE_SIZE * 10):
+        """Build the columnar snapshot of the search fields of every flight next to the database."""
+        import columnar # only when needed, since it imports numpy
+        version = self.version()
+        try:
+            columnar.write(self.model.database_path + '.snapshot', version, self.fields,
+                           self.model.find_iter(self.fields + (self.order,), None, None, size, self.order))
+        except mbiz.DatabaseError, e:
+            raise DatabaseError(e.message)
+        except (IOError, OSError), e:
+            raise DatabaseError(str(e))
+
+    def snapshot(self):
+        """Return the columnar snapshot of the database if it's up to date, None otherwise."""
+        path = os.path.abspath(self.model.database_path) + '.snapshot'
+        version = self.version()
+        snapshot = snapshots.get(path)
+        if snapshot == None or snapshot.version != version:
+            snapshots.pop(path, None)
+            if not os.path.exists(path):
+                return None
+            import columnar
+            try:
+                snapshot = columnar.Snapshot(path)
+            except (IOError, OSError, EOFError, ValueError, KeyError, cPickle.UnpicklingError):
+                return None
+            if snapshot.version != version or snapshot.fields != self.fields:
+                return None
+            snapshots[path] = snapshot
+        return snapshot
+
+    def find_snapshot(self, data, after=None):
+        """Return the results of the given data and page found in the snapshot, None if it's disabled, out of date or slower."""
+        if not config.SNAPSHOT or self.order != AircraftController.order:
+            return None
+        snapshot = self.snapshot()
+        criteria = self.criteria(data)
+        if snapshot == None or not snapshot.answers(criteria):
+            return None
+        return snapshot.find(criteria, after, config.LIMIT)
+
+    def criteria(self, data):
+        """Return the search criteria for the given data, None if there are none."""
         criteria = {}
         for key in data:
             if data[key] != '':
                 criteria[key] = data[key]
         if len(criteria) == 0:
             criteria = None
+        return criteria
+
+    def advise(self):
+        """Advise on the searches which scan a table as (field, query plan, missing indexes) tuples."""
+        advice = []
         try:
-            self.model.find(fields, criteria)
+            for field in self.searchable:
+                plan = self.model.explain(self.fields, {field: ''}, config.LIMIT, self.order) # the statement search runs
+                if len([detail for detail in plan if detail.startswith('SCAN')]) != 0:
+                    if field in self.model.columns(self.model.name):
+                        indexes = [(self.model.name, field), (self.model.child, self.model.foreign_key)]
+                    else:
+                        indexes = [(self.model.child, field)]
+                    advice.append((field, plan, [index for index in indexes if not self.model.indexed(*index)]))
+        except mbiz.DatabaseError, e:
+            raise DatabaseError(e.message)
+        self.set(self, 'advice', advice)
+
+    def index(self, database_path=None):
+        """Create the indexes missing for the searches in the database or in a copy of it at the given path."""
+        self.advise()
+        if database_path != None and os.path.abspath(database_path) != os.path.abspath(self.model.database_path):
+            shutil.copyfile(self.model.database_path, database_path)
+        else:
+            database_path = self.model.database_path
+        try:
+            model = mbiz.Model(database_path)
+            try:
+                for field, plan, indexes in self.advice:
+                    for table, column in indexes:
+                        model.create_index(table, column)
+            finally:
+                model.close()
         except mbiz.DatabaseError, e:
             raise DatabaseError(e.message)
-        self.set(self, 'results', self.model)
 
     def browser_lookup(self, data):
         """Lookup in a browser further details for the given data."""
@@ -102,6 +325,789 @@ class AircraftController(mbiz.Controller):
                 os.system('start iexplore "www.airframes.org/reg/' + data['registration'].replace('-', '') + '"')
 
 
+class ArchiveController(mbiz.Controller):
+
+    """ArchiveController controller derived from Controller.
+
+    Searches are run on every database of an archive at once by a pool of threads, which use every core since sqlite
+    releases the interpreter lock while it works, and their results are merged by start time under the global limit.
+    The last key of a page holds the key of the last record taken from each database, so that the next page resumes
+    every one of them where it stopped. If config.FEDERATE is True the databases are instead attached to a single
+    connection and searched by a single statement, which shares one page cache and needs no merging.
+
+    """
+
+    order = "coalesce(FLights.starttime, '') || ' ' || substr('0000000000' || FLights.flightid, -10)"
+
+    def __init__(self, database_paths):
+        """Initialize the ArchiveController controller by calling the __init__ method of the parent class."""
+        mbiz.Controller.__init__(self, None)
+        self.controllers = []
+        self.workers = None
+        try:
+            if config.FEDERATE:
+                self.controllers.append(AircraftController(database_paths[0]))
+                self.controllers[0].federate(database_paths[1:], self.order)
+            else:
+                for database_path in database_paths:
+                    self.controllers.append(AircraftController(database_path, self.order))
+        except mbiz.DatabaseError, e:
+            self.close()
+            raise DatabaseError(e.message)
+        except DatabaseError:
+            self.close()
+            raise
+        if not config.FEDERATE:
+            self.workers = multiprocessing.pool.ThreadPool(min(config.WORKERS or multiprocessing.cpu_count(), len(self.controllers)))
+
+    def search(self, data, after=None):
+        """Search every database for the page of results of the given data following the given last key."""
+        results, last_key, more = self.find(data, after)
+        self.set(self, 'results', results)
+        self.set(self, 'last_key', last_key)
+        self.set(self, 'more', more)
+
+    def search_iter(self, data, size=config.PAGE_SIZE, after=None):
+        """Search every database like search does but yield the results in pages of at most size records."""
+        self.search(data, after)
+        for index in range(0, len(self.results), size):
+            yield self.results[index:index + size]
+
+    def find(self, data, after=None):
+        """Return the page of results of the given data following the given last key, its last key and whether there's more."""
+        if config.FEDERATE:
+            self.controllers[0].search(data, after)
+            return list(self.controllers[0].results), self.controllers[0].last_key, self.controllers[0].more
+        if after == None:
+            after = (None,) * len(self.controllers)
+        def search(arguments):
+            controller, controller_after = arguments
+            controller.search(data, controller_after)
+            return list(controller.results)
+        pages = self.workers.map(search, zip(self.controllers, after))
+        merged = heapq.merge(*[[(row[-1], index, row) for row in page] for index, page in zip(range(len(pages)), pages)])
+        results = []
+        last_key = list(after)
+        taken = [0] * len(pages)
+        for key, index, row in itertools.islice(merged, config.LIMIT):
+            results.append(row[:-1])
+            last_key[index] = key
+            taken[index] += 1
+        more = len([index for index in range(len(pages)) if taken[index] < len(pages[index]) or self.controllers[index].more]) != 0
+        return results, tuple(last_key), more
+
+    def abort(self):
+        """Abort the searches in progress on every database."""
+        for controller in self.controllers:
+            controller.abort()
+
+    def close(self):
+        """Close the controller by closing the controllers of every database."""
+        if self.workers != None:
+            self.workers.close()
+        for controller in self.controllers:
+            controller.close()
+
+
+class Search:
+
+    """Class representing a search run in the background by the pool of search threads.
+
+    The pages of results are handed over through a bounded queue, so that a search whose pages aren't taken waits for
+    them instead of piling them up. A search can be cancelled from any thread, which interrupts the statement it's
+    running, and cancels itself once its timeout is over. Abandoning its pages before the end also cancels it.
+
+    """
+
+    def __init__(self, database_paths, data, after=None, size=config.PAGE_SIZE, timeout=None):
+        """Initialize the search of the given data in the given databases, cancelled after timeout seconds unless None."""
+        self.database_paths = database_paths
+        self.data = data
+        self.after = after
+        self.size = size
+        self.queue = Queue.Queue(config.SEARCH_QUEUE_SIZE)
+        self.lock = threading.Lock()
+        self.controller = None
+        self.cancelled = False
+        self.timed_out = False
+        self.abandoned = False
+        self.finished = threading.Event()
+        self.error = None
+        self.last_key = None
+        self.more = False
+        self.timer = None
+        if timeout != None:
+            self.timer = threading.Timer(timeout, self.expire)
+            self.timer.setDaemon(True)
+            self.timer.start()
+
+    def run(self):
+        """Run the search, putting its pages in the queue, which is then ended with None if there's room for it."""
+        try:
+            try:
+                self.lock.acquire()
+                try:
+                    if self.cancelled:
+                        raise DatabaseError('interrupted')
+                    if len(self.database_paths) == 1:
+                        self.controller = AircraftController(self.database_paths[0])
+                    else:
+                        self.controller = ArchiveController(self.database_paths)
+                finally:
+                    self.lock.release()
+                for page in self.controller.search_iter(self.data, self.size, self.after):
+                    if self.cancelled or not self.put(page):
+                        raise DatabaseError('interrupted')
+                self.last_key = self.controller.last_key
+                self.more = self.controller.more
+            except (DatabaseError, mbiz.DatabaseError), e:
+                self.error = e.message
+                if self.timed_out:
+                    self.error = 'search timed out'
+                elif self.cancelled:
+                    self.error = 'search cancelled'
+            except Exception, e: # any other failure must still end the pages with an error
+                self.error = str(e) or e.__class__.__name__
+        finally:
+            if self.timer != None:
+                self.timer.cancel()
+            self.lock.acquire()
+            try:
+                if self.controller != None:
+                    self.controller.close()
+                    self.controller = None
+            finally:
+                self.lock.release()
+            self.finished.set()
+            try:
+                self.queue.put_nowait(None)
+            except Queue.Full: # the pages end anyway once finished and taken
+                pass
+
+    def put(self, page):
+        """Put the given page in the queue once there's room, return False if cancelled or abandoned meanwhile."""
+        while not self.abandoned and not self.cancelled:
+            try:
+                self.queue.put(page, True, 0.1)
+                return True
+            except Queue.Full:
+                pass
+        return False
+
+    def pages(self):
+        """Yield the pages of results as they're found, raising DatabaseError if the search failed, was cancelled or timed out."""
+        try:
+            while True:
+                try:
+                    page = self.queue.get(True, 0.1)
+                except Queue.Empty:
+                    if self.finished.isSet() and self.queue.empty():
+                        break
+                    continue
+                if page == None:
+                    break
+                yield page
+            if self.error != None:
+                raise DatabaseError(self.error)
+        finally:
+            self.abandoned = True
+            if not self.finished.isSet():
+                self.cancel()
+
+    def cancel(self):
+        """Cancel the search, interrupting the statement it's running, can be called from any thread."""
+        self.lock.acquire()
+        try:
+            self.cancelled = True
+            if self.controller != None:
+                self.controller.abort()
+        finally:
+            self.lock.release()
+
+    def expire(self):
+        """Cancel the search because its timeout is over."""
+        self.timed_out = True
+        self.cancel()
+
+    def done(self):
+        """Return True if the search ended, whether it found every page, failed or was cancelled."""
+        return self.finished.isSet()
+
+    def wait(self, timeout=None):
+        """Wait at most timeout seconds, forever if None, for the search to end and return True if it did."""
+        self.finished.wait(timeout)
+        return self.finished.isSet()
+
+
+class SuggestionController(mbiz.Controller):
+
+    """SuggestionController controller derived from Controller.
+
+    The distinct values of the suggested fields are kept in lookup indexes which are saved next to the database along
+    with the last flight and aircraft ids read, so that updating them only reads the records added since.
+
+    """
+
+    suggested = (('callsign', 'flights'),
+                 ('registration', 'aircraft'),
+                 ('modes', 'aircraft'))
+
+    def __init__(self, database_path):
+        """Initialize the SuggestionController controller by calling the __init__ method of the parent class."""
+        try:
+            mbiz.Controller.__init__(self, Flight(database_path))
+        except mbiz.DatabaseError, e:
+            raise DatabaseError(e.message)
+        try:
+            self.aircraft = mbiz.Model(database_path, name='Aircraft', primary_key='aircraftid', read_only=True)
+        except mbiz.DatabaseError, e:
+            self.model.close()
+            raise DatabaseError(e.message)
+        self.path = database_path + '.suggestions'
+        self.indexes = {}
+        for field, table in self.suggested:
+            self.indexes[field] = lookup.Lookup()
+        self.marks = {'flights': 0, 'aircraft': 0}
+        self.load()
+
+    def load(self):
+        """Load the indexes saved next to the database, if any."""
+        saved = restore(self.path)
+        if saved == None:
+            return
+        for field, table in self.suggested:
+            self.indexes[field].update(saved['values'][field])
+        self.marks = saved['marks']
+
+    def save(self):
+        """Save the indexes next to the database, if its directory is writable."""
+        saved = {'marks': self.marks, 'values': {}}
+        for field, table in self.suggested:
+            saved['values'][field] = list(self.indexes[field].values)
+        store(self.path, saved)
+
+    def update(self, size=config.PAGE_SIZE * 10):
+        """Add the values of the records added since the last update to the indexes, yielding after each page read."""
+        try:
+            for table, model in (('flights', self.model), ('aircraft', self.aircraft)):
+                fields = [field for field, source in self.suggested if source == table]
+                key = model.name + '.' + model.primary_key
+                model.raw_sql('SELECT max(' + key + ') FROM ' + model.name)
+                if model[0][0] == None or model[0][0] < self.marks[table]: # another database, start over
+                    self.marks[table] = 0
+                    for field in fields:
+                        self.indexes[field] = lookup.Lookup()
+                pending = [set() for field in fields]
+                mark = self.marks[table]
+                for page in model.find_iter(fields, None, None, size, key, self.marks[table]):
+                    for position, values in zip(range(len(fields)), pending):
+                        values.update([row[position] for row in page if row[position]])
+                    mark = model.last_key
+                    if sum([len(values) for values in pending]) >= sum([len(self.indexes[field]) for field in fields]):
+                        self.add(table, fields, pending, mark)
+                    yield table
+                self.add(table, fields, pending, mark)
+        except mbiz.DatabaseError, e:
+            raise DatabaseError(e.message)
+        self.save()
+
+    def add(self, table, fields, pending, mark):
+        """Add the pending values of the given fields to their indexes, which then hold those of the table up to the given mark.
+
+        The values are added once there are as many as indexed, so that the indexes are sorted a few times only.
+
+        """
+        for field, values in zip(fields, pending):
+            self.indexes[field].update(values)
+            values.clear()
+        self.marks[table] = mark
+
+    def suggest(self, field, text, limit=config.COMPLETIONS):
+        """Return at most limit suggestions for the given text typed in the given field."""
+        return self.indexes[field].complete(text, limit)
+
+    def close(self):
+        """Close the controller by closing its models."""
+        self.model.close()
+        self.aircraft.close()
+
+
+class StatisticsController(mbiz.Controller):
+
+    """StatisticsController controller derived from Controller.
+
+    The statistics are counted in a single pass over the flights and saved next to the database along with the last flight
+    id read, so that updating them only reads the flights added since. Flights are only counted once finished, since
+    their alerts and squawks may still change, those read unfinished are read again by every update until they are.
+
+    """
+
+    counted = (('countries', 'modescountry'),
+               ('operators', 'operatorflagcode'),
+               ('types', 'icaotypecode'))
+
+    def __init__(self, database_path):
+        """Initialize the StatisticsController controller by calling the __init__ method of the parent class."""
+        try:
+            mbiz.Controller.__init__(self, Aircraft(database_path))
+        except mbiz.DatabaseError, e:
+            raise DatabaseError(e.message)
+        self.path = database_path + '.statistics'
+        self.reset()
+        self.load()
+
+    def reset(self):
+        """Reset the statistics to those of an empty database."""
+        self.statistics = {'mark': 0,
+                           'open': set(), # the ids of the flights up to the mark which weren't finished when read
+                           'flights': 0,
+                           'aircraft': set(),
+                           'alerts': 0,
+                           'emergencies': 0,
+                           'spis': 0,
+                           'days': collections.Counter(),
+                           'hours': collections.Counter()}
+        for name, field in self.counted:
+            self.statistics[name] = collections.Counter()
+
+    def load(self):
+        """Load the statistics saved next to the database, if any."""
+        saved = restore(self.path)
+        if saved != None:
+            saved.setdefault('open', set())
+            self.statistics = saved
+
+    def save(self):
+        """Save the statistics next to the database, if its directory is writable."""
+        store(self.path, self.statistics)
+
+    def update(self, size=config.PAGE_SIZE * 10):
+        """Count the flights finished since the last update, yielding after each page counted."""
+        statistics = self.statistics
+        key = 'FLights.flightid'
+        fields = tuple([field for name, field in self.counted]) + ('starttime', 'hadalert', 'hademergency', 'hadspi', 'Aircraft.aircraftid',
+                                                                   'endtime', key)
+        try:
+            self.model.raw_sql('SELECT max(FlightID) FROM Flights')
+            if self.model[0][0] == None or self.model[0][0] < statistics['mark']: # another database, start over
+                self.reset()
+            opened = sorted(statistics['open'])
+            for index in range(0, len(opened), size):
+                self.model.raw_sql(self.model.select(fields, None, None) + ' WHERE ' + key + ' IN (' +
+                                   ', '.join([str(flight_id) for flight_id in opened[index:index + size]]) + ') AND endtime IS NOT NULL')
+                self.count(self.model)
+                yield statistics['flights']
+            for page in self.model.find_iter(fields, None, None, size, key, statistics['mark']):
+                self.count(page)
+                statistics['mark'] = page[-1][-1]
+                yield statistics['flights']
+        except mbiz.DatabaseError, e:
+            raise DatabaseError(e.message)
+        self.save()
+
+    def count(self, rows):
+        """Count the given rows of flights which are finished, keeping the ids of the others to count them once they are."""
+        statistics = self.statistics
+        for row in rows:
+            if row[-2] == None:
+                statistics['open'].add(row[-1])
+                continue
+            statistics['open'].discard(row[-1])
+            for position, (name, field) in zip(range(len(self.counted)), self.counted):
+                statistics[name][row[position]] += 1
+            starttime, alert, emergency, spi, aircraft_id = row[len(self.counted):-2]
+            if starttime:
+                statistics['days'][starttime[:10]] += 1
+                statistics['hours'][starttime[11:13]] += 1
+            statistics['aircraft'].add(aircraft_id)
+            statistics['alerts'] += bool(alert)
+            statistics['emergencies'] += bool(emergency)
+            statistics['spis'] += bool(spi)
+            statistics['flights'] += 1
+
+    def summary(self, top=10):
+        """Return the statistics as a dictionary with the top values of every count and the rates of alerts and the like."""
+        statistics = self.statistics
+        summary = {'flights': statistics['flights'], 'aircraft': len(statistics['aircraft'])}
+        for name in ('alerts', 'emergencies', 'spis'):
+            summary[name] = statistics[name]
+            summary[name + '_rate'] = statistics[name] / float(max(statistics['flights'], 1))
+        for name, field in self.counted:
+            summary[name] = statistics[name].most_common(top)
+        summary['days'] = statistics['days'].most_common(top)
+        summary['hours'] = sorted(statistics['hours'].items())
+        return summary
+
+
+class FullTextController(mbiz.Controller):
+
+    """FullTextController controller derived from Controller.
+
+    The fields searched for patterns the most are kept in a trigram index of a side-car database along with the version
+    of the database indexed, so that searches only use it while it's up to date. Flights are indexed from the first one
+    still unfinished when last updated, aircraft, which are fewer and change, are indexed all over again.
+
+    """
+
+    patterns = {'callsign': 'FLights.flightid IN (SELECT rowid FROM fulltext.flights WHERE callsign LIKE :callsign)',
+                'registration': 'Aircraft.aircraftid IN (SELECT rowid FROM fulltext.aircraft WHERE registration LIKE :registration)',
+                'modes': 'Aircraft.aircraftid IN (SELECT rowid FROM fulltext.aircraft WHERE modes LIKE :modes)',
+                'operatorflagcode': 'Aircraft.aircraftid IN (SELECT rowid FROM fulltext.aircraft WHERE operatorflagcode LIKE :operatorflagcode)'}
+
+    def __init__(self, database_path):
+        """Initialize the FullTextController controller by calling the __init__ method of the parent class."""
+        try:
+            mbiz.Controller.__init__(self, mbiz.Model(database_path + '.fts', name='flights', primary_key='rowid'))
+        except mbiz.DatabaseError, e:
+            raise DatabaseError(e.message)
+        self.database_path = database_path
+
+    def update(self, size=config.PAGE_SIZE * 100):
+        """Index the flights added or unfinished since the last update and every aircraft, yielding after each page indexed."""
+        indexed_version = repr(version(self.database_path))
+        model = self.model
+        try:
+            model.raw_sql("CREATE VIRTUAL TABLE IF NOT EXISTS flights USING fts5(callsign, tokenize='trigram')")
+            model.raw_sql("CREATE VIRTUAL TABLE IF NOT EXISTS aircraft USING fts5(registration, modes, operatorflagcode, tokenize='trigram')")
+            model.raw_sql("CREATE TABLE IF NOT EXISTS state (name TEXT PRIMARY KEY, value)")
+            model.attach(self.database_path, 'source')
+            model.raw_sql("SELECT value FROM state WHERE name = 'flights'")
+            mark = 0
+            if len(model) != 0:
+                mark = model[0][0]
+            model.raw_sql("SELECT max(FlightID) FROM source.Flights")
+            if model[0][0] == None or model[0][0] < mark: # another database, start over
+                model.raw_sql("DELETE FROM flights")
+                mark = 0
+            model.raw_sql("SELECT min(FlightID) FROM source.Flights WHERE FlightID > " + str(mark) + " AND EndTime IS NULL")
+            unfinished = model[0][0]
+            while True:
+                model.raw_sql("SELECT max(FlightID) FROM (SELECT FlightID FROM source.Flights WHERE FlightID > " + str(mark) +
+                              " ORDER BY FlightID LIMIT " + str(size) + ")")
+                last = model[0][0]
+                if last == None:
+                    break
+                model.raw_sql("INSERT OR REPLACE INTO flights (rowid, callsign) SELECT FlightID, Callsign FROM source.Flights " +
+                              "WHERE FlightID > " + str(mark) + " AND FlightID <= " + str(last))
+                mark = last
+                model.commit()
+                yield 'flights'
+            if unfinished != None:
+                mark = unfinished - 1
+            model.raw_sql("DELETE FROM aircraft")
+            model.raw_sql("INSERT INTO aircraft (rowid, registration, modes, operatorflagcode) " +
+                          "SELECT AircraftID, Registration, ModeS, OperatorFlagCode FROM source.Aircraft")
+            model.raw_sql("INSERT OR REPLACE INTO state (name, value) VALUES ('flights', " + str(mark) + ")")
+            model.raw_sql("INSERT OR REPLACE INTO state (name, value) VALUES ('version', '" + indexed_version + "')")
+            model.commit()
+            yield 'aircraft'
+        except mbiz.DatabaseError, e:
+            raise DatabaseError(e.message)
+
+
+class RollupController(mbiz.Controller):
+
+    """RollupController controller derived from Controller.
+
+    The flights per aircraft per day and per operator per hour are summed in tables of a side-car database, which
+    reports query instead of the flights. The tables are brought up to date by adding the flights after the last one
+    summed, whose id is stored along with the sums in the same transaction.
+
+    """
+
+    def __init__(self, database_path):
+        """Initialize the RollupController controller by calling the __init__ method of the parent class."""
+        try:
+            mbiz.Controller.__init__(self, mbiz.Model(database_path + '.rollup', name='daily', primary_key='aircraftid'))
+        except mbiz.DatabaseError, e:
+            raise DatabaseError(e.message)
+        self.database_path = database_path
+
+    def update(self, size=config.PAGE_SIZE * 100):
+        """Sum the flights added since the last update, yielding the id of the last one summed after each page."""
+        model = self.model
+        try:
+            model.raw_sql("CREATE TABLE IF NOT EXISTS daily (aircraftid INTEGER, day TEXT, flights INTEGER, PRIMARY KEY (aircraftid, day))")
+            model.raw_sql("CREATE TABLE IF NOT EXISTS hourly (operator TEXT, hour TEXT, flights INTEGER, PRIMARY KEY (operator, hour))")
+            model.raw_sql("CREATE TABLE IF NOT EXISTS state (name TEXT PRIMARY KEY, value)")
+            model.attach(self.database_path, 'source')
+            model.raw_sql("SELECT value FROM state WHERE name = 'flights'")
+            mark = 0
+            if len(model) != 0:
+                mark = model[0][0]
+            model.raw_sql("SELECT max(FlightID) FROM source.Flights")
+            if model[0][0] == None or model[0][0] < mark: # another database, start over
+                model.raw_sql("DELETE FROM daily")
+                model.raw_sql("DELETE FROM hourly")
+                model.raw_sql("DELETE FROM state WHERE name = 'flights'")
+                model.commit()
+                mark = 0
+            while True:
+                model.raw_sql("SELECT max(FlightID) FROM (SELECT FlightID FROM source.Flights WHERE FlightID > " + str(mark) +
+                              " ORDER BY FlightID LIMIT " + str(size) + ")")
+                last = model[0][0]
+                if last == None:
+                    break
+                where = "WHERE FlightID > " + str(mark) + " AND FlightID <= " + str(last)
+                model.raw_sql("INSERT INTO daily (aircraftid, day, flights) " +
+                              "SELECT AircraftID, coalesce(substr(StartTime, 1, 10), ''), count(*) FROM source.Flights " + where +
+                              " GROUP BY 1, 2 ON CONFLICT (aircraftid, day) DO UPDATE SET flights = flights + excluded.flights")
+                model.raw_sql("INSERT INTO hourly (operator, hour, flights) " +
+                              "SELECT coalesce(Aircraft.OperatorFlagCode, ''), coalesce(substr(StartTime, 1, 13), ''), count(*) " +
+                              "FROM source.Flights LEFT JOIN source.Aircraft ON Aircraft.AircraftID = Flights.AircraftID " + where +
+                              " GROUP BY 1, 2 ON CONFLICT (operator, hour) DO UPDATE SET flights = flights + excluded.flights")
+                model.raw_sql("INSERT OR REPLACE INTO state (name, value) VALUES ('flights', " + str(last) + ")")
+                model.commit()
+                mark = last
+                yield mark
+        except mbiz.DatabaseError, e:
+            raise DatabaseError(e.message)
+
+    def daily(self, aircraft_id=None):
+        """Return the number of flights of each day, in order, only those of the given aircraft id unless None."""
+        sql = "SELECT day, sum(flights) FROM daily"
+        if aircraft_id != None:
+            sql += " WHERE aircraftid = " + str(int(aircraft_id))
+        return self.query(sql + " GROUP BY day ORDER BY day")
+
+    def hourly(self, operator=None):
+        """Return the number of flights of each hour, in order, only those of the given operator unless None."""
+        sql = "SELECT hour, sum(flights) FROM hourly"
+        if operator != None:
+            sql += " WHERE operator = '" + operator.replace("'", "''") + "'"
+        return self.query(sql + " GROUP BY hour ORDER BY hour")
+
+    def busiest(self, period='', limit=10):
+        """Return the aircraft ids and the operators with the most flights in the days and hours starting with the given period."""
+        period = "'" + period.replace("'", "''") + "%'"
+        return (self.query("SELECT aircraftid, sum(flights) FROM daily WHERE day LIKE " + period +
+                           " GROUP BY aircraftid ORDER BY 2 DESC LIMIT " + str(int(limit))),
+                self.query("SELECT operator, sum(flights) FROM hourly WHERE hour LIKE " + period +
+                           " GROUP BY operator ORDER BY 2 DESC LIMIT " + str(int(limit))))
+
+    def query(self, sql):
+        """Return the rows of the given query of the rollup tables, none if they were never updated."""
+        try:
+            model = self.model
+            model.raw_sql("SELECT count(*) FROM sqlite_master WHERE name = 'hourly'")
+            if model[0][0] == 0:
+                return []
+            model.raw_sql(sql)
+            return list(model)
+        except mbiz.DatabaseError, e:
+            raise DatabaseError(e.message)
+
+
+class IngestController(mbiz.Controller):
+
+    """IngestController controller derived from Controller.
+
+    Messages update the aircraft and the open flight they were sent by in memory, and the records changed are written by
+    flush in a single transaction. A flight is left without an end time until its aircraft is silent for
+    config.FLIGHT_TIMEOUT seconds, or the ingestion ends, which then sets it to the time of its last message. Silences are
+    measured by the times the messages were sent, so that replaying a recorded feed splits flights like the live one.
+
+    """
+
+    flight_fields = ('FlightID',
+                     'SessionID',
+                     'AircraftID',
+                     'StartTime',
+                     'EndTime',
+                     'Callsign',
+                     'FirstSquawk',
+                     'LastSquawk',
+                     'HadAlert',
+                     'HadEmergency',
+                     'HadSPI')
+
+    def __init__(self, database_path):
+        """Initialize the IngestController controller by calling the __init__ method of the parent class."""
+        try:
+            mbiz.Controller.__init__(self, Flight(database_path, read_only=False))
+            model = self.model
+            for sql_statement in SCHEMA:
+                model.raw_sql(sql_statement)
+            model.raw_sql('SELECT ModeS, AircraftID FROM Aircraft')
+            self.aircraft = dict(model)
+            model.raw_sql('SELECT max(SessionID) FROM Flights')
+        except mbiz.DatabaseError, e:
+            raise DatabaseError(e.message)
+        self.session_id = (model[0][0] or 0) + 1
+        self.flights = {} # the open flight of each ModeS, as a list of flight_fields values, without ids until written
+        self.seen = {} # the time, in seconds, each ModeS was last heard of
+        self.clock = None # the latest time, in seconds, of the messages applied
+        self.last_times = {} # the time of the last message of each ModeS, the end time of its flight once closed
+        self.new_aircraft = []
+        self.changed_flights = {} # the ModeS and values of each flight changed, by object id as new ones have no id yet
+        self.count = 0
+
+    def apply(self, message):
+        """Apply the given message to its aircraft and open flight."""
+        now = seconds(message['time'])
+        if now == None: # not a valid time, as if sent along with the latest one
+            now = self.clock
+        elif self.clock == None or now > self.clock:
+            self.clock = now
+        modes = message['modes']
+        if modes not in self.aircraft:
+            self.aircraft[modes] = None
+            self.new_aircraft.append(modes)
+        flight = self.flights.get(modes)
+        if flight != None and now != None and self.seen[modes] != None and now - self.seen[modes] > config.FLIGHT_TIMEOUT:
+            self.end(modes)
+            flight = None
+        if flight == None:
+            flight = self.flights[modes] = [None, self.session_id, self.aircraft[modes], message['time'], None, None,
+                                            None, None, False, False, False]
+        self.seen[modes] = now
+        self.last_times[modes] = message['time']
+        if message.get('callsign') and flight[5] == None:
+            flight[5] = message['callsign']
+        if message.get('squawk') != None:
+            if flight[6] == None:
+                flight[6] = message['squawk']
+            flight[7] = message['squawk']
+        flight[8] = flight[8] or bool(message.get('alert'))
+        flight[9] = flight[9] or bool(message.get('emergency'))
+        flight[10] = flight[10] or bool(message.get('spi'))
+        self.changed_flights[id(flight)] = (modes, flight)
+        self.count += 1
+
+    def pending(self):
+        """Return the number of records changed since the last flush."""
+        return len(self.new_aircraft) + len(self.changed_flights)
+
+    def end(self, modes):
+        """Close the open flight of the given ModeS, setting its end time, which is written by the next flush."""
+        flight = self.flights.pop(modes)
+        flight[4] = self.last_times.pop(modes)
+        del self.seen[modes]
+        self.changed_flights[id(flight)] = (modes, flight)
+
+    def flush(self, final=False):
+        """Close the flights timed out, or every one if final, and write the records changed since the last flush in a single transaction.
+
+        The ids of new aircraft and flights are given by the database, so that other writers can't take them meanwhile,
+        and the aircraft another writer added meanwhile are used as they are.
+
+        """
+        for modes, seen in self.seen.items():
+            if final or (seen != None and self.clock - seen > config.FLIGHT_TIMEOUT):
+                self.end(modes)
+        model = self.model
+        aircraft = {}
+        flight_ids = []
+        try:
+            with model.transaction():
+                model.write_many(('ModeS',), [(modes,) for modes in self.new_aircraft], 'Aircraft', ignore=True)
+                for index in range(0, len(self.new_aircraft), 500):
+                    model.raw_sql('SELECT ModeS, AircraftID FROM Aircraft WHERE ModeS IN (' +
+                                  ', '.join(["'" + modes.replace("'", "''") + "'" for modes in self.new_aircraft[index:index + 500]]) + ')')
+                    aircraft.update(model)
+                rows = []
+                for modes, flight in self.changed_flights.values():
+                    row = list(flight)
+                    row[2] = self.aircraft[modes] or aircraft[modes]
+                    if row[0] == None:
+                        flight_ids.append((flight, model.insert(self.flight_fields[1:], row[1:])))
+                    else:
+                        rows.append(row)
+                model.upsert_many(self.flight_fields, rows)
+        except mbiz.DatabaseError, e:
+            raise DatabaseError(e.message)
+        self.aircraft.update(aircraft)
+        for modes, flight in self.changed_flights.values():
+            flight[2] = self.aircraft[modes]
+        for flight, flight_id in flight_ids:
+            flight[0] = flight_id
+        self.new_aircraft = []
+        self.changed_flights = {}
+
+
+def archive(path):
+    """Return the sorted paths of the databases in the given directory or matching the given glob pattern."""
+    if os.path.isdir(path):
+        path = os.path.join(path, '*.sqb')
+    return sorted(glob.glob(path))
+
+
+def restore(path):
+    """Return the object pickled in the given file, None if it can't be read."""
+    try:
+        saved_file = open(path, 'rb')
+        try:
+            return cPickle.load(saved_file)
+        finally:
+            saved_file.close()
+    except (IOError, EOFError, ValueError, cPickle.UnpicklingError):
+        return None
+
+
+def store(path, value):
+    """Pickle the given object to the given file, replacing it at once, unless its directory isn't writable."""
+    try:
+        saved_file = open(path + '.tmp', 'wb')
+        try:
+            cPickle.dump(value, saved_file, cPickle.HIGHEST_PROTOCOL)
+        finally:
+            saved_file.close()
+        os.rename(path + '.tmp', path)
+    except (IOError, OSError):
+        pass
+
+
+def submit(database_paths, data, after=None, size=config.PAGE_SIZE, timeout=None):
+    """Return the search of the given data in the given databases started in the background, see Search."""
+    search = Search(database_paths, data, after, size, timeout)
+    workers_lock.acquire()
+    try:
+        if 'searches' not in workers:
+            workers['searches'] = multiprocessing.pool.ThreadPool(config.SEARCHES)
+        workers['searches'].apply_async(search.run)
+    finally:
+        workers_lock.release()
+    return search
+
+
+def seconds(timestamp):
+    """Return the seconds since the epoch of the given time of a message, as YYYY-MM-DD HH:MM:SS.fff, None if it's not one."""
+    try:
+        day = days.get(timestamp[:10])
+        if day == None:
+            day = days[timestamp[:10]] = calendar.timegm(time.strptime(timestamp[:10], '%Y-%m-%d'))
+        return day + int(timestamp[11:13]) * 3600 + int(timestamp[14:16]) * 60 + float(timestamp[17:])
+    except ValueError:
+        return None
+
+
+def version(database_path):
+    """Return the version of the given database, which changes whenever it's written.
+
+    The write-ahead log of a database in WAL mode only counts while it holds pages, since it's created empty merely by
+    reading the database.
+
+    """
+    database_path = os.path.abspath(database_path)
+    version = []
+    for path in (database_path, database_path + '-wal'):
+        if os.path.exists(path):
+            stat = os.stat(path)
+            if stat.st_size != 0 or path == database_path:
+                version.append((stat.st_mtime, stat.st_size))
+    return tuple(version)
+
+
+def weigh(rows):
+    """Return an estimate of the bytes taken by the given rows."""
+    weight = sys.getsizeof(rows)
+    for row in rows:
+        weight += sys.getsizeof(row)
+        for value in row:
+            weight += sys.getsizeof(value)
+    return weight
+
+
 class DatabaseError(Exception):
 
     """Class representing a database error."""
@@ -113,3 +1119,17 @@ class DatabaseError(Exception):
     def __str___(self):
         """Return the string representation of the exception."""
         return repr(self.message)
+
+
+SCHEMA = ('CREATE TABLE IF NOT EXISTS Aircraft (AircraftID INTEGER PRIMARY KEY, ModeS VARCHAR(6) NOT NULL UNIQUE, ' +
+          'ModeSCountry VARCHAR(24), Registration VARCHAR(20), ICAOTypeCode VARCHAR(10), OperatorFlagCode VARCHAR(20))',
+          'CREATE TABLE IF NOT EXISTS Flights (FlightID INTEGER PRIMARY KEY, SessionID INTEGER, AircraftID INTEGER, ' +
+          'StartTime DATETIME, EndTime DATETIME, Callsign VARCHAR(20), FirstSquawk INTEGER, LastSquawk INTEGER, ' +
+          'HadAlert BOOLEAN, HadEmergency BOOLEAN, HadSPI BOOLEAN)',
+          'CREATE INDEX IF NOT EXISTS Flights_AircraftID_index ON Flights (AircraftID)')
+cache = mbiz.Cache(config.CACHE_SIZE, weigh)
+versions = {}
+snapshots = {}
+days = {} # the seconds since the epoch of the days of the messages ingested, by date
+workers = {} # the pools of threads running work in the background, by kind, started when first needed
+workers_lock = threading.Lock()
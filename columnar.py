@@ -0,0 +1,319 @@
+#    Copyright (C) 2008 Vasco Costa <vasco dot costa at geekslot dot com>
+#
+#    This file is part of sbs1explorer.
+#
+#    sbs1explorer is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    sbs1explorer is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Column oriented snapshots of record sets.
+
+This module writes record sets to side-car files where each field is stored as
+a column of dictionary codes, so that a criterion is first evaluated once per
+distinct value of its field and then turned into a filter of the codes of the
+whole column. Each record ends with an integer key, by which the records must
+be sorted, so that pages following a given key can be found by bisection.
+
+Fields with more distinct values than half the records, like times, are stored
+as plain fixed width strings instead, since a dictionary of them would be as
+large as the records and have to be read whole when the snapshot is opened.
+
+When numpy is available the columns are memory mapped and filtered by it,
+otherwise they are read into arrays and filtered by plain python.
+
+Classes:
+
+Snapshot - class representing a snapshot read from a file.
+Strings - class representing a column of fixed width strings.
+
+Functions:
+
+pattern - return whether a criterion is a pattern.
+predicate - return the test of a criterion.
+write - write a snapshot of record sets to a file.
+
+"""
+
+import array
+import bisect
+import cPickle
+import mmap
+import os
+import struct
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+import lookup
+
+
+MAGIC = 'SBS1SNAP'
+NULL = '\xff' # never found in UTF-8, stands for None in the columns of plain values
+
+
+class Snapshot:
+
+    """Class representing a snapshot read from a file."""
+
+    def __init__(self, path):
+        """Initialize the snapshot by reading the header of the given file and mapping its columns."""
+        snapshot_file = open(path, 'rb')
+        try:
+            if snapshot_file.read(len(MAGIC)) != MAGIC:
+                raise IOError('not a snapshot: ' + path)
+            header_size = struct.unpack('<Q', snapshot_file.read(8))[0]
+            header = cPickle.loads(snapshot_file.read(header_size))
+            self.version = header['version']
+            self.fields = header['fields']
+            self.count = header['count']
+            self.dictionaries = header['dictionaries']
+            self.distinct = {} # the values and codes of the plain columns searched by patterns, by column
+            offsets = []
+            offset = align(len(MAGIC) + 8 + header_size)
+            for typecode in header['typecodes']:
+                offsets.append(offset)
+                offset = align(offset + itemsize(typecode) * self.count)
+            if numpy != None and self.count != 0:
+                self.map = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+                columns = [numpy.frombuffer(self.map, typecode, self.count, offset)
+                           for typecode, offset in zip(header['typecodes'], offsets)]
+                self.keys = columns[0]
+                self.columns = columns[1:]
+            else:
+                self.keys = None
+                self.columns = []
+                for typecode, offset in zip(header['typecodes'], offsets):
+                    snapshot_file.seek(offset)
+                    if typecode.startswith('S'):
+                        column = Strings(snapshot_file.read(itemsize(typecode) * self.count), itemsize(typecode))
+                    else:
+                        column = array.array(typecode)
+                        column.fromfile(snapshot_file, self.count)
+                    if self.keys == None:
+                        self.keys = column
+                    else:
+                        self.columns.append(column)
+        finally:
+            snapshot_file.close()
+
+    def answers(self, criteria=None):
+        """Return True if the records matching the given criteria are found faster than by SQLite.
+
+        Patterns on columns of plain values aren't, since their distinct values have to be found first.
+
+        """
+        if criteria != None:
+            for field in criteria:
+                if self.dictionaries[self.fields.index(field)] == None and pattern(criteria[field]):
+                    return False
+        return True
+
+    def find(self, criteria=None, after=None, limit=None):
+        """Find at most limit records after the given key matching the given criteria like the = and LIKE operators do.
+
+        Return the records found along with the key of the last one.
+
+        """
+        tests = []
+        if criteria != None:
+            for field in sorted(criteria.keys()):
+                column = self.fields.index(field)
+                test = predicate(criteria[field])
+                if self.dictionaries[column] == None:
+                    if not pattern(criteria[field]):
+                        tests.append((column, None, encode(criteria[field])))
+                    else:
+                        values, codes_column = self.codes(column)
+                        tests.append((column, [code for code, value in enumerate(values) if test(value)], codes_column))
+                else:
+                    tests.append((column, [code for code, value in enumerate(self.dictionaries[column]) if test(value)], self.columns[column]))
+        if isinstance(self.keys, array.array):
+            start = 0
+            if after != None:
+                start = bisect.bisect_right(self.keys, after)
+            positions = xrange(start, self.count)
+            for column, codes, codes_column in tests:
+                if codes == None: # the value itself
+                    values_column = self.columns[column]
+                    positions = [position for position in positions if values_column[position] == codes_column]
+                else:
+                    codes = frozenset(codes)
+                    positions = [position for position in positions if codes_column[position] in codes]
+            positions = list(positions)[:limit]
+        else:
+            start = 0
+            if after != None:
+                start = int(numpy.searchsorted(self.keys, after, 'right'))
+            mask = numpy.ones(self.count - start, numpy.bool_)
+            for column, codes, codes_column in tests:
+                if codes == None:
+                    mask &= self.columns[column][start:] == codes_column
+                else:
+                    mask &= numpy.in1d(codes_column[start:], codes)
+            positions = numpy.flatnonzero(mask)[:limit] + start
+        rows = []
+        for position in positions:
+            row = []
+            for dictionary, column in zip(self.dictionaries, self.columns):
+                if dictionary == None:
+                    row.append(decode(column[position]))
+                else:
+                    row.append(dictionary[column[position]])
+            rows.append(tuple(row))
+        if len(rows) == 0:
+            return rows, None
+        return rows, int(self.keys[positions[-1]])
+
+    def codes(self, column):
+        """Return the distinct values of the given plain column and the column of their codes, found once when first needed."""
+        if column not in self.distinct:
+            if isinstance(self.keys, array.array):
+                codes = {}
+                codes_column = array.array('i')
+                values_column = self.columns[column]
+                for position in xrange(self.count):
+                    codes_column.append(codes.setdefault(values_column[position], len(codes)))
+                values = [None] * len(codes)
+                for value, code in codes.items():
+                    values[code] = decode(value)
+            else:
+                values, codes_column = numpy.unique(self.columns[column], return_inverse=True)
+                values = [decode(value) for value in values]
+            self.distinct[column] = (values, codes_column)
+        return self.distinct[column]
+
+
+class Strings:
+
+    """Class representing a column of fixed width strings read into memory, when numpy isn't available."""
+
+    def __init__(self, data, width):
+        """Initialize the column with the given data of strings of the given width."""
+        self.data = data
+        self.width = width
+
+    def __getitem__(self, position):
+        """Return the string at the given position, without its padding."""
+        return self.data[position * self.width:(position + 1) * self.width].rstrip('\0')
+
+
+def align(offset):
+    """Return the given offset rounded up to a multiple of 8."""
+    return offset + -offset % 8
+
+
+def decode(value):
+    """Return the value of a string read from a column of plain values."""
+    if value == NULL:
+        return None
+    return str(value).decode('utf-8')
+
+
+def encode(value):
+    """Return the string stored for the given value in a column of plain values."""
+    if value == None:
+        return NULL
+    return value.encode('utf-8')
+
+
+def itemsize(typecode):
+    """Return the bytes taken by each value of a column of the given typecode, S followed by the width for strings."""
+    if typecode.startswith('S'):
+        return int(typecode[1:])
+    return array.array(typecode).itemsize
+
+
+def pattern(criterion):
+    """Return True if the given criterion is a pattern, having % or _ wildcards."""
+    return criterion.find('%') != -1 or criterion.find('_') != -1
+
+
+def predicate(criterion):
+    """Return the function testing whether a value matches the given criterion, like LIKE does if it's a pattern."""
+    if pattern(criterion):
+        expression = lookup.expression(criterion)
+        def test(value):
+            if value == None:
+                return False
+            if isinstance(value, str):
+                value = value.decode('utf-8', 'replace')
+            return expression.match(unicode(value)) != None
+        return test
+    try:
+        number = float(criterion)
+    except ValueError:
+        number = None
+    def test(value):
+        if isinstance(value, (int, long, float)):
+            return value == number
+        return value == criterion
+    return test
+
+
+def write(path, version, fields, pages):
+    """Write a snapshot of the given fields of the records in the given pages, with the given version, to a file.
+
+    The records are followed by their integer key, which they must be sorted by. Fields of strings with more distinct
+    values than half the records are stored as plain values.
+
+    """
+    keys = array.array('l')
+    columns = []
+    codes = []
+    dictionaries = []
+    for field in fields:
+        columns.append(array.array('i'))
+        codes.append({})
+        dictionaries.append([])
+    for page in pages:
+        for row in page:
+            keys.append(row[-1])
+            for value, column, column_codes, dictionary in zip(row, columns, codes, dictionaries):
+                code = column_codes.get(value)
+                if code == None:
+                    code = column_codes[value] = len(dictionary)
+                    dictionary.append(value)
+                column.append(code)
+    typecodes = ['l']
+    values = [] # of each column, the dictionary of those stored as plain values
+    for index, dictionary in enumerate(dictionaries):
+        if len(dictionary) * 2 > len(keys) and len([value for value in dictionary if value != None and not isinstance(value, basestring)]) == 0:
+            typecodes.append('S' + str(max([len(encode(value)) for value in dictionary] + [1])))
+            values.append(dictionary)
+            dictionaries[index] = None
+        else:
+            typecodes.append('i')
+            values.append(None)
+    header = cPickle.dumps({'version': version,
+                            'fields': tuple(fields),
+                            'count': len(keys),
+                            'dictionaries': dictionaries,
+                            'typecodes': typecodes}, cPickle.HIGHEST_PROTOCOL)
+    snapshot_file = open(path + '.tmp', 'wb')
+    try:
+        snapshot_file.write(MAGIC)
+        snapshot_file.write(struct.pack('<Q', len(header)))
+        snapshot_file.write(header)
+        for column, typecode, dictionary in zip([keys] + columns, typecodes, [None] + values):
+            snapshot_file.write('\0' * (align(snapshot_file.tell()) - snapshot_file.tell()))
+            if dictionary == None:
+                column.tofile(snapshot_file)
+            else:
+                strings = [encode(value).ljust(itemsize(typecode), '\0') for value in dictionary]
+                for index in xrange(0, len(column), 10000):
+                    snapshot_file.write(''.join([strings[code] for code in column[index:index + 10000]]))
+    finally:
+        snapshot_file.close()
+    os.rename(path + '.tmp', path)
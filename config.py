@@ -19,4 +19,31 @@
 DATABASE_PATH = "BaseStation.sqb"
 JOIN = "INNER JOIN"
 LIMIT = 5000
+PAGE_SIZE = 100
+PROGRESS_STEPS = 1000
+SLOW_QUERY = 1.0 # seconds, slower queries are recorded with their query plan, never if None
+TRACE_SIZE = 1000 # records kept by ring sinks
+POOL_SIZE = 4
+WORKERS = None # threads searching archives, one per core if None
+SEARCHES = 8 # searches run at once in the background, the others wait for one to end
+SEARCH_QUEUE_SIZE = 10 # pages a background search finds ahead of those taken
+FEDERATE = False # True to search archives by attaching their databases to a single connection instead
+STATEMENT_CACHE_SIZE = 100
+BATCH_SIZE = 1000 # records
+JOURNAL_MODE = None # of the databases written, e.g. "WAL", None to keep theirs
+IMMUTABLE = False # True to read databases which are static copies without locking them
+BUSY_TIMEOUT = 5.0 # seconds
+RETRIES = 3
+RETRY_DELAY = 0.1 # seconds, doubled on every retry
+CACHE_SIZE = 64 * 1024 * 1024 # bytes
+COMPLETIONS = 20
+MATCHES_COUNTED = 1000 # matches of a pattern typed counted at most
+LOOKUP_INSERTS = 32 # values added to a lookup index one by one at most, each moving the values after it
+SNAPSHOT = True
+FULLTEXT = True
+FEED_PORT = 30003
+FEED_QUEUE_SIZE = 100000 # messages
+FLUSH_INTERVAL = 1.0 # seconds
+FLUSH_SIZE = 10000 # records
+FLIGHT_TIMEOUT = 300 # seconds of silence, by the times the messages were sent, ending a flight
 DEBUG = False
@@ -0,0 +1,756 @@
+#    Copyright (C) 2008 Vasco Costa <vasco dot costa at geekslot dot com>
+#
+#    This file is part of sbs1explorer.
+#
+#    sbs1explorer is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    sbs1explorer is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Presentation layer of the application.
+
+This module implements the wxPython GUI of the application on top of the
+business module. It's only imported by the main function of the sbs1explorer
+module, and itself only imports the business, lookup and constants modules when
+they are first needed, so that the program starts as fast as possible.
+
+Classes:
+
+ResultEvent - class representing search result events.
+ResultTable - class representing the virtual table of the results grid.
+SearchThread - class representing search worker threads.
+SuggestThread - class representing suggestion and full text indexing threads.
+MainWindow - class representing the main window.
+App - class representing the application.
+
+"""
+
+import os
+import threading
+import time
+
+import wx
+import wx.grid
+import wx.lib.dialogs
+
+import config
+
+
+PROGRAM_NAME = 'SBS1 Explorer'
+PROGRAM_VERSION = 'v0.2.1'
+PROGRAM_AUTHOR = 'Vasco Costa <vasco dot costa at geekslot dot com>'
+
+ID_MENU_FILE_OPEN = 1
+ID_MENU_FILE_EXIT = 2
+ID_MENU_DATABASE_INFO = 3
+ID_MENU_DATABASE_SEARCH = 4
+ID_MENU_DATABASE_CLEAR = 5
+ID_MENU_HELP_HELP = 6
+ID_MENU_HELP_ABOUT = 7
+ID_BUTTON_SEARCH = 8
+ID_BUTTON_CLEAR = 9
+ID_BUTTON_STOP = 10
+ID_EVT_RESULT = 11
+ID_MENU_DATABASE_INDEXES = 12
+ID_MENU_DATABASE_NEXT = 13
+ID_BUTTON_NEXT = 14
+ID_MENU_FILE_OPEN_ARCHIVE = 15
+ID_EVT_INFO = 16
+
+RESULT_CHUNK_ROWS = 500 # post the results every so many rows
+RESULT_CHUNK_INTERVAL = 0.25 # or every so many seconds
+RESULT_SAMPLE_ROWS = 100 # size the columns to fit this many rows
+
+
+def EVT_RESULT(win, func):
+    win.Connect(-1, -1, ID_EVT_RESULT, func)
+
+
+class ResultEvent(wx.PyEvent):
+
+    def __init__(self, data, last=True, key=None, error=None):
+        wx.PyEvent.__init__(self)
+        self.SetEventType(ID_EVT_RESULT)
+        self.data = data
+        self.last = last
+        self.key = key
+        self.error = error
+
+
+def EVT_INFO(win, func):
+    win.Connect(-1, -1, ID_EVT_INFO, func)
+
+
+class InfoEvent(wx.PyEvent):
+
+    def __init__(self, database_path, count=0, summary=None, error=None):
+        wx.PyEvent.__init__(self)
+        self.SetEventType(ID_EVT_INFO)
+        self.database_path = database_path
+        self.count = count
+        self.summary = summary
+        self.error = error
+
+
+class ResultTable(wx.grid.PyGridTableBase):
+
+    def __init__(self, labels, links):
+        wx.grid.PyGridTableBase.__init__(self)
+        self.labels = labels
+        self.links = links
+        self.rows = []
+        self.link_attr = wx.grid.GridCellAttr()
+        self.link_attr.SetTextColour(wx.Colour(0, 0, 255))
+
+    def GetNumberRows(self):
+        return len(self.rows)
+
+    def GetNumberCols(self):
+        return len(self.labels)
+
+    def IsEmptyCell(self, row, col):
+        return False
+
+    def GetValue(self, row, col):
+        return str(self.rows[row][col])
+
+    def SetValue(self, row, col, value):
+        pass
+
+    def GetColLabelValue(self, col):
+        return self.labels[col]
+
+    def GetAttr(self, row, col, kind):
+        if col in self.links:
+            self.link_attr.IncRef()
+            return self.link_attr
+        return None
+
+    def Append(self, rows):
+        self.rows.extend(rows)
+        message = wx.grid.GridTableMessage(self, wx.grid.GRIDTABLE_NOTIFY_ROWS_APPENDED, len(rows))
+        self.GetView().ProcessTableMessage(message)
+
+    def Clear(self):
+        if len(self.rows) != 0:
+            message = wx.grid.GridTableMessage(self, wx.grid.GRIDTABLE_NOTIFY_ROWS_DELETED, 0, len(self.rows))
+            del self.rows[:]
+            self.GetView().ProcessTableMessage(message)
+
+
+class SearchThread(threading.Thread):
+
+    def __init__(self, notify_window, database_paths, data, after=None):
+        threading.Thread.__init__(self)
+        self._notify_window = notify_window
+        self.database_paths = database_paths
+        self.data = data
+        self.after = after
+        self._want_abort = 0
+        self._aircraft_controller = None
+        self.start()
+
+    def run(self):
+        import business
+        result = ResultEvent([])
+        try:
+            try:
+                if len(self.database_paths) == 1:
+                    self._aircraft_controller = business.AircraftController(self.database_paths[0])
+                else:
+                    self._aircraft_controller = business.ArchiveController(self.database_paths)
+                if self._want_abort:
+                    self._aircraft_controller.abort()
+                chunk = []
+                timestamp = time.time()
+                for page in self._aircraft_controller.search_iter(self.data, after=self.after):
+                    chunk.extend(page)
+                    if len(chunk) >= RESULT_CHUNK_ROWS or time.time() - timestamp >= RESULT_CHUNK_INTERVAL:
+                        wx.PostEvent(self._notify_window, ResultEvent(chunk, False))
+                        chunk = []
+                        timestamp = time.time()
+                if self._aircraft_controller.more:
+                    result = ResultEvent(chunk, True, self._aircraft_controller.last_key)
+                else:
+                    result = ResultEvent(chunk)
+            except business.DatabaseError, e:
+                if self._want_abort:
+                    result = ResultEvent(None)
+                else:
+                    result = ResultEvent([], error=e.message)
+        finally:
+            if self._aircraft_controller:
+                self._aircraft_controller.close()
+            wx.PostEvent(self._notify_window, result) # always, so that the window stops searching
+
+    def abort(self):
+        self._want_abort = 1
+        if self._aircraft_controller:
+            self._aircraft_controller.abort()
+
+
+class SuggestThread(threading.Thread):
+
+    def __init__(self, database_path):
+        threading.Thread.__init__(self)
+        self.database_path = database_path
+        self.suggestion_controller = None # set once the saved suggestions are loaded
+        self._want_abort = 0
+        self.setDaemon(True)
+        self.start()
+
+    def run(self):
+        import business
+        try:
+            suggestion_controller = business.SuggestionController(self.database_path)
+            self.suggestion_controller = suggestion_controller
+            try:
+                for table in suggestion_controller.update():
+                    if self._want_abort:
+                        return
+            finally:
+                suggestion_controller.close()
+        except business.DatabaseError, e:
+            pass
+        try:
+            full_text_controller = business.FullTextController(self.database_path)
+            try:
+                for table in full_text_controller.update():
+                    if self._want_abort:
+                        break
+            finally:
+                full_text_controller.close()
+        except business.DatabaseError, e:
+            pass
+
+    def abort(self):
+        self._want_abort = 1
+
+
+class InfoThread(threading.Thread):
+
+    def __init__(self, notify_window, database_path):
+        threading.Thread.__init__(self)
+        self._notify_window = notify_window
+        self.database_path = database_path
+        self.setDaemon(True)
+        self.start()
+
+    def run(self):
+        import business
+        result = InfoEvent(self.database_path, error='Counting stopped.')
+        try:
+            try:
+                statistics_controller = business.StatisticsController(self.database_path)
+                try:
+                    for count in statistics_controller.update():
+                        wx.PostEvent(self._notify_window, InfoEvent(self.database_path, count))
+                    result = InfoEvent(self.database_path, summary=statistics_controller.summary())
+                finally:
+                    statistics_controller.close()
+            except business.DatabaseError, e:
+                result = InfoEvent(self.database_path, error=e.message)
+        finally:
+            wx.PostEvent(self._notify_window, result) # always, so that Info is enabled again
+
+
+class MainWindow(wx.Frame):
+
+    def __init__(self, parent, id, title, size=(800, 600)):
+        wx.Frame.__init__(self, parent, wx.ID_ANY, title, size=(800, 600))
+        # menu widgets
+        self.menu_file = wx.Menu()
+        self.menu_database = wx.Menu()
+        self.menu_options = wx.Menu()
+        self.menu_help = wx.Menu()
+        self.menu_file.Append(ID_MENU_FILE_OPEN, '&Open...', 'Open base station database.')
+        self.menu_file.Append(ID_MENU_FILE_OPEN_ARCHIVE, 'Open &archive...', 'Open a directory of base station databases.')
+        self.menu_file.AppendSeparator()
+        self.menu_file.Append(ID_MENU_FILE_EXIT, 'E&xit', 'Terminate the program.')
+        self.menu_database.Append(ID_MENU_DATABASE_INFO, '&Info', 'Display database information.')
+        self.menu_database.Append(ID_MENU_DATABASE_SEARCH, '&Search', 'Query the database.')
+        self.menu_database.Append(ID_MENU_DATABASE_NEXT, '&Next page', 'Query the database for the next page of records.')
+        self.menu_database.Append(ID_MENU_DATABASE_CLEAR, '&Clear', 'Clear the search fields.')
+        self.menu_database.AppendSeparator()
+        self.menu_database.Append(ID_MENU_DATABASE_INDEXES, 'In&dexes...', 'Check and create the indexes used by the searches.')
+        self.menu_help.Append(ID_MENU_HELP_HELP, '&Help', 'Display help information.')
+        self.menu_help.AppendSeparator()
+        self.menu_help.Append(ID_MENU_HELP_ABOUT, '&About ' + PROGRAM_NAME, 'Display About information.')
+        self.menu_bar = wx.MenuBar()
+        self.menu_bar.Append(self.menu_file, '&File')
+        self.menu_bar.Append(self.menu_database, '&Database')
+        self.menu_bar.Append(self.menu_options, '&Options')
+        self.menu_bar.Append(self.menu_help, '&Help')
+        self.menu_database.Enable(ID_MENU_DATABASE_NEXT, False)
+        # static text widgets
+        self.static_text_squawk = wx.StaticText(self, -1, 'Squawk:', style=wx.ALIGN_LEFT)
+        self.static_text_callsign = wx.StaticText(self, -1, 'Callsign:', style=wx.ALIGN_LEFT)
+        self.static_text_alert = wx.StaticText(self, -1, 'Alert:', style=wx.ALIGN_LEFT)
+        self.static_text_emergency = wx.StaticText(self, -1, 'Emergency:', style=wx.ALIGN_LEFT)
+        self.static_text_spi = wx.StaticText(self, -1, 'SPI:', style=wx.ALIGN_LEFT)
+        self.static_text_modes = wx.StaticText(self, -1, 'ModeS:', style=wx.ALIGN_LEFT)
+        self.static_text_registration = wx.StaticText(self, -1, 'Registration:', style=wx.ALIGN_LEFT)
+        self.static_text_type = wx.StaticText(self, -1, 'Type:', style=wx.ALIGN_LEFT)
+        self.static_text_operator = wx.StaticText(self, -1, 'Operator:', style=wx.ALIGN_LEFT)
+        self.static_text_country = wx.StaticText(self, -1, 'Country:', style=wx.ALIGN_LEFT)
+        # text ctrl widgets
+        self.text_ctrl_squawk = wx.TextCtrl(self, -1)
+        self.text_ctrl_callsign = wx.TextCtrl(self, -1)
+        self.text_ctrl_modes = wx.TextCtrl(self, -1)
+        self.text_ctrl_registration = wx.TextCtrl(self, -1)
+        self.text_ctrl_operator = wx.TextCtrl(self, -1)
+        self.text_ctrl_squawk.SetToolTip(wx.ToolTip('You can use SQL wildcards like % and _.'))
+        self.text_ctrl_callsign.SetToolTip(wx.ToolTip('You can use SQL wildcards like % and _.'))
+        self.text_ctrl_modes.SetToolTip(wx.ToolTip('You can use SQL wildcards like % and _.'))
+        self.text_ctrl_registration.SetToolTip(wx.ToolTip('You can use SQL wildcards like % and _.'))
+        self.text_ctrl_operator.SetToolTip(wx.ToolTip('You can use SQL wildcards like % and _.'))
+        # combo box widgets
+        self.combo_box_alert = wx.ComboBox(self, -1, choices=('True', 'False'))
+        self.combo_box_emergency = wx.ComboBox(self, -1, choices=('True', 'False'))
+        self.combo_box_spi = wx.ComboBox(self, -1, choices=('True', 'False'))
+        self.combo_box_type = wx.ComboBox(self, -1) # the choices are loaded after the window is shown
+        self.combo_box_country = wx.ComboBox(self, -1)
+        self.combo_box_alert.SetToolTip(wx.ToolTip('You can use SQL wildcards like % and _.'))
+        self.combo_box_emergency.SetToolTip(wx.ToolTip('You can use SQL wildcards like % and _.'))
+        self.combo_box_spi.SetToolTip(wx.ToolTip('You can use SQL wildcards like % and _.'))
+        self.combo_box_type.SetToolTip(wx.ToolTip('You can use SQL wildcards like % and _.'))
+        self.combo_box_country.SetToolTip(wx.ToolTip('You can use SQL wildcards like % and _.'))
+        self.combo_box_alert.Enable(False)
+        self.combo_box_emergency.Enable(False)
+        self.combo_box_spi.Enable(False)
+        # grid widgets
+        self.grid_results = wx.grid.Grid(self)
+        self.table_results = ResultTable(('Date',
+                                          'Squawk',
+                                          'Callsign',
+                                          'Alert',
+                                          'Emergency',
+                                          'SPI',
+                                          'ModeS',
+                                          'Registration',
+                                          'Type',
+                                          'Operator',
+                                          'Country'), (2, 7))
+        self.grid_results.SetTable(self.table_results, True)
+        self.grid_results.AutoSizeColumns()
+        self.grid_results.EnableEditing(False)
+        self.grid_results.SetToolTip(wx.ToolTip('Click the blue links for details.'))
+        # button widgets
+        self.button_search = wx.Button(self, ID_BUTTON_SEARCH, 'Search')
+        self.button_clear = wx.Button(self, ID_BUTTON_CLEAR, 'Clear')
+        self.button_next = wx.Button(self, ID_BUTTON_NEXT, 'Next')
+        self.button_stop = wx.Button(self, ID_BUTTON_STOP, 'Stop')
+        self.button_next.Enable(False)
+        self.button_stop.Enable(False)
+        # box sizers
+        self.box_sizer_1 = wx.BoxSizer(wx.HORIZONTAL)
+        self.box_sizer_2 = wx.BoxSizer(wx.HORIZONTAL)
+        self.box_sizer_3 = wx.BoxSizer(wx.HORIZONTAL)
+        self.box_sizer_4 = wx.BoxSizer(wx.HORIZONTAL)
+        self.box_sizer_5 = wx.BoxSizer(wx.HORIZONTAL)
+        self.box_sizer_6 = wx.BoxSizer(wx.HORIZONTAL)
+        self.box_sizer_7 = wx.BoxSizer(wx.HORIZONTAL)
+        self.box_sizer_root = wx.BoxSizer(wx.VERTICAL)
+        self.box_sizer_1.Add(self.static_text_squawk, 1, wx.EXPAND)
+        self.box_sizer_1.Add(self.text_ctrl_squawk, 3, wx.EXPAND)
+        self.box_sizer_1.AddStretchSpacer()
+        self.box_sizer_1.Add(self.static_text_modes, 1, wx.EXPAND)
+        self.box_sizer_1.Add(self.text_ctrl_modes, 3, wx.EXPAND)
+        self.box_sizer_2.Add(self.static_text_callsign, 1, wx.EXPAND)
+        self.box_sizer_2.Add(self.text_ctrl_callsign, 3, wx.EXPAND)
+        self.box_sizer_2.AddStretchSpacer()
+        self.box_sizer_2.Add(self.static_text_registration, 1, wx.EXPAND)
+        self.box_sizer_2.Add(self.text_ctrl_registration, 3, wx.EXPAND)
+        self.box_sizer_3.Add(self.static_text_alert, 1, wx.EXPAND)
+        self.box_sizer_3.Add(self.combo_box_alert,3, wx.EXPAND)
+        self.box_sizer_3.AddStretchSpacer()
+        self.box_sizer_3.Add(self.static_text_type, 1, wx.EXPAND)
+        self.box_sizer_3.Add(self.combo_box_type, 3, wx.EXPAND)
+        self.box_sizer_4.Add(self.static_text_emergency, 1, wx.EXPAND)
+        self.box_sizer_4.Add(self.combo_box_emergency, 3, wx.EXPAND)
+        self.box_sizer_4.AddStretchSpacer()
+        self.box_sizer_4.Add(self.static_text_operator, 1, wx.EXPAND)
+        self.box_sizer_4.Add(self.text_ctrl_operator, 3, wx.EXPAND)
+        self.box_sizer_5.Add(self.static_text_spi, 1, wx.EXPAND)
+        self.box_sizer_5.Add(self.combo_box_spi, 3, wx.EXPAND)
+        self.box_sizer_5.AddStretchSpacer()
+        self.box_sizer_5.Add(self.static_text_country, 1, wx.EXPAND)
+        self.box_sizer_5.Add(self.combo_box_country, 3, wx.EXPAND)
+        self.box_sizer_6.Add(self.grid_results, 1, wx.EXPAND)
+        self.box_sizer_7.Add(self.button_search, 1, wx.EXPAND)
+        self.box_sizer_7.Add(self.button_clear, 1, wx.EXPAND)
+        self.box_sizer_7.Add(self.button_next, 1, wx.EXPAND)
+        self.box_sizer_7.Add(self.button_stop, 1, wx.EXPAND)
+        self.box_sizer_root.Add(self.box_sizer_1, 0, wx.EXPAND | wx.ALL, 5)
+        self.box_sizer_root.Add(self.box_sizer_2, 0, wx.EXPAND | wx.ALL, 5)
+        self.box_sizer_root.Add(self.box_sizer_3, 0, wx.EXPAND | wx.ALL, 5)
+        self.box_sizer_root.Add(self.box_sizer_4, 0, wx.EXPAND | wx.ALL, 5)
+        self.box_sizer_root.Add(self.box_sizer_5, 0, wx.EXPAND | wx.ALL, 5)
+        self.box_sizer_root.Add(self.box_sizer_6, 1, wx.EXPAND | wx.ALL, 5)
+        self.box_sizer_root.Add(self.box_sizer_7, 0, wx.EXPAND | wx.ALL, 5)
+        # events
+        wx.EVT_MENU(self, ID_MENU_FILE_OPEN, self.OnMenuFileOpen)
+        wx.EVT_MENU(self, ID_MENU_FILE_OPEN_ARCHIVE, self.OnMenuFileOpenArchive)
+        wx.EVT_MENU(self, ID_MENU_FILE_EXIT, self.OnMenuFileExit)
+        wx.EVT_MENU(self, ID_MENU_DATABASE_INFO, self.OnMenuDatabaseInfo)
+        wx.EVT_MENU(self, ID_MENU_DATABASE_SEARCH, self.OnMenuDatabaseSearch)
+        wx.EVT_MENU(self, ID_MENU_DATABASE_NEXT, self.OnMenuDatabaseNext)
+        wx.EVT_MENU(self, ID_MENU_DATABASE_CLEAR, self.OnMenuDatabaseClear)
+        wx.EVT_MENU(self, ID_MENU_DATABASE_INDEXES, self.OnMenuDatabaseIndexes)
+        wx.EVT_MENU(self, ID_MENU_HELP_HELP, self.OnMenuHelpHelp)
+        wx.EVT_MENU(self, ID_MENU_HELP_ABOUT, self.OnMenuHelpAbout)
+        wx.grid.EVT_GRID_CELL_LEFT_CLICK(self, self.OnGridResults)
+        wx.EVT_BUTTON(self, ID_BUTTON_SEARCH, self.OnButtonSearch)
+        wx.EVT_BUTTON(self, ID_BUTTON_CLEAR, self.OnButtonClear)
+        wx.EVT_BUTTON(self, ID_BUTTON_NEXT, self.OnButtonNext)
+        wx.EVT_BUTTON(self, ID_BUTTON_STOP, self.OnButtonStop)
+        wx.EVT_TEXT(self, self.combo_box_type.GetId(), self.OnComboBoxType)
+        wx.EVT_TEXT(self, self.combo_box_country.GetId(), self.OnComboBoxCountry)
+        wx.EVT_TEXT(self, self.text_ctrl_callsign.GetId(), self.OnTextCtrlCallsign)
+        wx.EVT_TEXT(self, self.text_ctrl_registration.GetId(), self.OnTextCtrlRegistration)
+        wx.EVT_TEXT(self, self.text_ctrl_modes.GetId(), self.OnTextCtrlModes)
+        EVT_RESULT(self, self.OnResult)
+        EVT_INFO(self, self.OnInfo)
+        # frame methods
+        self.worker = None # set the worker attribute elsewhere
+        self.data = None
+        self.last_key = None
+        self.page = 0
+        self.completing = False
+        self.typed = {}
+        self.suggester = None
+        self.counter = None
+        self.CreateStatusBar()
+        self.SetMenuBar(self.menu_bar)
+        self.SetSizer(self.box_sizer_root)
+        self.SetAutoLayout(True)
+        #self.box_sizer_root.Fit(self)
+        self.SetBackgroundColour(wx.NullColour)
+        self.Show(True)
+        wx.CallAfter(self.LoadChoices)
+
+    def LoadChoices(self):
+        import lookup
+        self.combo_box_type.AppendItems(lookup.type_codes().prefix(''))
+        self.combo_box_country.AppendItems(lookup.countries().prefix(''))
+
+    def Complete(self, control, index, name):
+        if self.completing:
+            return
+        text = control.GetValue()
+        typed = self.typed.get(control.GetId(), '')
+        self.typed[control.GetId()] = text
+        if text == '':
+            return
+        if text.find('%') != -1 or text.find('_') != -1:
+            matches = len(index.match(text, config.MATCHES_COUNTED))
+            if matches == config.MATCHES_COUNTED:
+                self.SetStatusText(str(matches) + '+ matching ' + name + '.')
+            else:
+                self.SetStatusText(str(matches) + ' matching ' + name + '.')
+        else:
+            self.SetStatusText(str(index.count(text)) + ' matching ' + name + '.')
+            completions = index.prefix(text, 1)
+            if len(text) > len(typed) and len(completions) != 0: # not when deleting
+                self.completing = True
+                control.SetValue(completions[0]) # in the case of the value, since = is case sensitive
+                if isinstance(control, wx.ComboBox):
+                    control.SetMark(len(text), len(completions[0]))
+                else:
+                    control.SetSelection(len(text), len(completions[0]))
+                self.completing = False
+
+    def ValidateData(self, data):
+        import lookup
+        for key, index, name in (('icaotypecode', lookup.type_codes(), 'type'), ('modescountry', lookup.countries(), 'country')):
+            value = data[key]
+            if value != '' and value.find('%') == -1 and value.find('_') == -1 and value not in index:
+                message_dialog_question = wx.MessageDialog(self, 'Unknown ' + name + ' ' + value + ', search anyway?', 'Warning', wx.YES_NO | wx.ICON_WARNING)
+                if message_dialog_question.ShowModal() != wx.ID_YES:
+                    return False
+        return True
+
+    def OnMenuFileOpen(self, event):
+        file_dialog_open = wx.FileDialog(self, 'Please choose a database file.', '', 'BaseStation.sqb', '*.sqb')
+        if file_dialog_open.ShowModal() != wx.ID_CANCEL:
+            self.database_path = file_dialog_open.GetPath()
+            self.database_paths = [self.database_path]
+            self.ResetPages()
+            self.SetStatusText('Opened ' + self.database_path + '.')
+            if self.suggester:
+                self.suggester.abort()
+            self.suggester = SuggestThread(self.database_path)
+
+    def OnMenuFileOpenArchive(self, event):
+        import business
+        dir_dialog_open = wx.DirDialog(self, 'Please choose a directory of database files.')
+        if dir_dialog_open.ShowModal() != wx.ID_CANCEL:
+            database_paths = business.archive(dir_dialog_open.GetPath())
+            if len(database_paths) == 0:
+                message_dialog_warning = wx.MessageDialog(self, 'No database files found.', 'Warning', wx.OK | wx.ICON_WARNING)
+                message_dialog_warning.ShowModal()
+                return
+            self.database_path = database_paths[-1] # the latest, whose suggestions, indexes and lookups are used
+            self.database_paths = database_paths
+            self.ResetPages()
+            self.SetStatusText('Opened ' + dir_dialog_open.GetPath() + ', ' + str(len(database_paths)) + ' databases.')
+            if self.suggester:
+                self.suggester.abort()
+            self.suggester = SuggestThread(self.database_path)
+
+    def OnMenuFileExit(self, event):
+        self.Close(True)
+
+    def OnMenuDatabaseInfo(self, event):
+        if self.counter:
+            return
+        try:
+            self.counter = InfoThread(self, self.database_path)
+        except AttributeError:
+            message_dialog_error = wx.MessageDialog(self, 'Please open a database file first.', 'Error', wx.OK | wx.ICON_ERROR)
+            message_dialog_error.ShowModal()
+            return
+        self.menu_database.Enable(ID_MENU_DATABASE_INFO, False)
+        self.SetStatusText('Counting flights...')
+
+    def OnInfo(self, event):
+        if event.summary == None and event.error == None:
+            self.SetStatusText('Counting flights, ' + str(event.count) + ' counted...')
+            return
+        self.counter = None
+        self.menu_database.Enable(ID_MENU_DATABASE_INFO, True)
+        self.SetStatusText('')
+        if event.error != None:
+            message_dialog_error = wx.MessageDialog(self, event.error, 'Database error', wx.OK | wx.ICON_ERROR)
+            message_dialog_error.ShowModal()
+            return
+        summary = event.summary
+        lines = [os.path.basename(event.database_path), '',
+                 str(summary['flights']) + ' finished flights of ' + str(summary['aircraft']) + ' aircraft.',
+                 '%.1f%% with alerts, %.1f%% with emergencies, %.1f%% with SPI.' %
+                 (summary['alerts_rate'] * 100, summary['emergencies_rate'] * 100, summary['spis_rate'] * 100)]
+        for name, title in (('countries', 'Countries'), ('operators', 'Operators'), ('types', 'Types'), ('days', 'Busiest days')):
+            lines.extend(['', title + ':'] + [u'    ' + unicode(value or '?') + ': ' + str(count) for value, count in summary[name]])
+        lines.extend(['', 'Flights per hour:'] + ['    ' + hour + 'h: ' + str(count) for hour, count in summary['hours']])
+        message_dialog_info = wx.lib.dialogs.ScrolledMessageDialog(self, u'\n'.join(lines), 'Info')
+        message_dialog_info.ShowModal()
+
+    def OnMenuDatabaseSearch(self, event):
+        import business
+        data = {
+            'firstsquawk':self.text_ctrl_squawk.GetValue(),
+            'callsign':self.text_ctrl_callsign.GetValue(),
+            'hadalert':self.combo_box_alert.GetValue(),
+            'hademergency':self.combo_box_emergency.GetValue(),
+            'hadspi':self.combo_box_spi.GetValue(),
+            'modes':self.text_ctrl_modes.GetValue(),
+            'registration':self.text_ctrl_registration.GetValue(),
+            'icaotypecode':self.combo_box_type.GetValue(),
+            'operatorflagcode':self.text_ctrl_operator.GetValue(),
+            'modescountry':self.combo_box_country.GetValue()}
+        if not self.worker:
+            try:
+                if self.database_path != '' and len([element for element in data.values() if element != '']) != 0:
+                    if not self.ValidateData(data):
+                        return
+                    self.table_results.Clear()
+                    self.SetStatusText('Searching...')
+                    try:
+                        self.worker = SearchThread(self, self.database_paths, data)
+                        self.data = data
+                        self.page = 1
+                        self.EnableNext(False)
+                        self.button_stop.Enable(True)
+                    except business.DatabaseError, e:
+                        self.SetStatusText('')
+                        message_dialog_error = wx.MessageDialog(self, e.message, 'Database error', wx.OK | wx.ICON_ERROR)
+                        message_dialog_error.ShowModal()
+                        self.worker = None
+                else:
+                    message_dialog_warning = wx.MessageDialog(self, 'Please be more specific.', 'Warning', wx.OK | wx.ICON_WARNING)
+                    message_dialog_warning.ShowModal()
+            except AttributeError:
+                message_dialog_error = wx.MessageDialog(self, 'Please open a database file first.', 'Error', wx.OK | wx.ICON_ERROR)
+                message_dialog_error.ShowModal()
+
+    def OnMenuDatabaseNext(self, event):
+        if not self.worker and self.last_key != None:
+            self.table_results.Clear()
+            self.SetStatusText('Searching...')
+            self.worker = SearchThread(self, self.database_paths, self.data, self.last_key)
+            self.page += 1
+            self.EnableNext(False)
+            self.button_stop.Enable(True)
+
+    def OnMenuDatabaseClear(self, event):
+        self.text_ctrl_squawk.SetValue('')
+        self.text_ctrl_callsign.SetValue('')
+        self.combo_box_alert.SetValue('')
+        self.combo_box_emergency.SetValue('')
+        self.combo_box_spi.SetValue('')
+        self.text_ctrl_modes.SetValue('')
+        self.text_ctrl_registration.SetValue('')
+        self.combo_box_type.SetValue('')
+        self.text_ctrl_operator.SetValue('')
+        self.combo_box_country.SetValue('')
+
+    def OnMenuDatabaseIndexes(self, event):
+        import business
+        try:
+            aircraft_controller = business.AircraftController(self.database_path)
+        except AttributeError:
+            message_dialog_error = wx.MessageDialog(self, 'Please open a database file first.', 'Error', wx.OK | wx.ICON_ERROR)
+            message_dialog_error.ShowModal()
+            return
+        except business.DatabaseError, e:
+            message_dialog_error = wx.MessageDialog(self, e.message, 'Database error', wx.OK | wx.ICON_ERROR)
+            message_dialog_error.ShowModal()
+            return
+        try:
+            try:
+                aircraft_controller.advise()
+                indexes = []
+                for field, plan, missing in aircraft_controller.advice:
+                    indexes.extend([table + '.' + column for table, column in missing if table + '.' + column not in indexes])
+                if len(indexes) == 0:
+                    message_dialog_info = wx.MessageDialog(self, 'No indexes are missing.', 'Indexes', wx.OK | wx.ICON_INFORMATION)
+                    message_dialog_info.ShowModal()
+                else:
+                    message = 'Searches by ' + ', '.join([field for field, plan, missing in aircraft_controller.advice]) + ' scan a whole table.\n\n' +\
+                              'Create the missing indexes on ' + ', '.join(indexes) + '? This writes to the database file.'
+                    message_dialog_question = wx.MessageDialog(self, message, 'Indexes', wx.YES_NO | wx.ICON_QUESTION)
+                    if message_dialog_question.ShowModal() == wx.ID_YES:
+                        self.SetStatusText('Creating indexes...')
+                        wx.BeginBusyCursor()
+                        try:
+                            aircraft_controller.index()
+                        finally:
+                            wx.EndBusyCursor()
+                        self.SetStatusText('Created ' + str(len(indexes)) + ' indexes.')
+            except business.DatabaseError, e:
+                self.SetStatusText('')
+                message_dialog_error = wx.MessageDialog(self, e.message, 'Database error', wx.OK | wx.ICON_ERROR)
+                message_dialog_error.ShowModal()
+        finally:
+            aircraft_controller.close()
+
+    def OnMenuHelpHelp(self, event):
+        pass
+
+    def OnMenuHelpAbout(self, event):
+        message_dialog_about = wx.MessageDialog(self, PROGRAM_NAME + ' ' + PROGRAM_VERSION + '\n\n' + 'Copyright 2008 ' + PROGRAM_AUTHOR, 'About', wx.OK)
+        message_dialog_about.ShowModal()
+
+    def OnGridResults(self, event):
+        import business
+        if event.GetCol() in (2, 7):
+            data = {}
+            if event.GetCol() == 2:
+                data['callsign'] = self.grid_results.GetCellValue(event.GetRow(), event.GetCol())
+            if event.GetCol() == 7:
+                data['registration'] = self.grid_results.GetCellValue(event.GetRow(), event.GetCol())
+            aircraft_controller = business.AircraftController(self.database_path)
+            aircraft_controller.browser_lookup(data)
+            aircraft_controller.close()
+
+    def OnComboBoxType(self, event):
+        import lookup
+        self.Complete(self.combo_box_type, lookup.type_codes(), 'types')
+
+    def OnComboBoxCountry(self, event):
+        import lookup
+        self.Complete(self.combo_box_country, lookup.countries(), 'countries')
+
+    def OnTextCtrlCallsign(self, event):
+        self.Suggest(self.text_ctrl_callsign, 'callsign', 'callsigns')
+
+    def OnTextCtrlRegistration(self, event):
+        self.Suggest(self.text_ctrl_registration, 'registration', 'registrations')
+
+    def OnTextCtrlModes(self, event):
+        self.Suggest(self.text_ctrl_modes, 'modes', 'ModeS codes')
+
+    def Suggest(self, text_ctrl, field, name):
+        if self.suggester and self.suggester.suggestion_controller:
+            self.Complete(text_ctrl, self.suggester.suggestion_controller.indexes[field], name)
+
+    def OnButtonSearch(self, event):
+        self.OnMenuDatabaseSearch(event)
+
+    def OnButtonClear(self, event):
+        self.OnMenuDatabaseClear(event)
+
+    def OnButtonNext(self, event):
+        self.OnMenuDatabaseNext(event)
+
+    def OnButtonStop(self, event):
+        if self.worker:
+            self.worker.abort()
+
+    def ResetPages(self):
+        if self.worker:
+            self.worker.abort()
+        self.data = None
+        self.last_key = None
+        self.page = 0
+        self.EnableNext(False)
+
+    def EnableNext(self, enable):
+        self.menu_database.Enable(ID_MENU_DATABASE_NEXT, enable)
+        self.button_next.Enable(enable)
+
+    def SizeGridResults(self):
+        client_dc = wx.ClientDC(self.grid_results)
+        for col in range(self.table_results.GetNumberCols()):
+            client_dc.SetFont(self.grid_results.GetLabelFont())
+            width = client_dc.GetTextExtent(self.table_results.GetColLabelValue(col))[0]
+            client_dc.SetFont(self.grid_results.GetDefaultCellFont())
+            for row in range(min(self.table_results.GetNumberRows(), RESULT_SAMPLE_ROWS)):
+                width = max(width, client_dc.GetTextExtent(self.table_results.GetValue(row, col))[0])
+            self.grid_results.SetColSize(col, width + 10)
+        self.grid_results.ForceRefresh()
+
+    def OnResult(self, event):
+        if event.data == None:
+            self.SetStatusText('Stopped search.') 
+            self.last_key = None
+        else:
+            rows = self.table_results.GetNumberRows()
+            if len(event.data) != 0:
+                self.table_results.Append(event.data)
+                if rows == 0 or event.last:
+                    self.SizeGridResults()
+            if event.error != None:
+                self.SetStatusText('Database error: ' + event.error)
+                self.last_key = None
+                self.EnableNext(False)
+            elif event.last:
+                if self.page > 1:
+                    self.SetStatusText(str(rows + len(event.data)) + ' records, page ' + str(self.page) + '.')
+                else:
+                    self.SetStatusText(str(rows + len(event.data)) + ' records.')
+                self.last_key = event.key
+                self.EnableNext(self.last_key != None)
+            else:
+                self.SetStatusText('Searching... ' + str(rows + len(event.data)) + ' records.')
+                return
+        self.button_stop.Enable(False)
+        self.worker = None
+
+
+class App:
+
+    def __init__(self, title, size=(800, 600)):
+        self.py_simple_app = wx.PySimpleApp()
+        self.main_window = MainWindow(None, -1, title, size)
+        self.py_simple_app.MainLoop()
+
@@ -0,0 +1,261 @@
+#    Copyright (C) 2008 Vasco Costa <vasco dot costa at geekslot dot com>
+#
+#    This file is part of sbs1explorer.
+#
+#    sbs1explorer is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    sbs1explorer is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Ingestion of SBS-1 feeds.
+
+This module reads the messages BaseStation, or any program emulating it, sends
+on port 30003 as lines of comma separated values and keeps a flights database
+up to date with them, so that an archive can be built without the BaseStation
+software.
+
+A reader thread parses the lines into a bounded queue, which blocks it when
+full so that a writer falling behind throttles the feed through TCP instead of
+buffering it without bound. A writer thread applies the messages and writes the
+records changed every flush interval, or sooner if there are many, in a single
+transaction.
+
+The database is switched to WAL mode, unless told otherwise, so that it can be
+searched while it's written.
+
+A server replaying a recorded feed is included for testing.
+
+Classes:
+
+Reader - class representing threads reading a feed.
+Writer - class representing threads writing messages to a database.
+ReplayServer - class representing servers replaying recorded feeds.
+
+Functions:
+
+parse - return the message of a line of a feed.
+
+Usage: python ingest.py [options] database
+
+"""
+
+import socket
+import sys
+import threading
+import time
+import Queue
+from optparse import OptionParser
+
+import business
+import config
+import mbiz
+
+
+class Reader(threading.Thread):
+
+    """Class representing a thread reading the messages of a feed into a queue."""
+
+    def __init__(self, host, port, queue, reconnect=None):
+        """Initialize the reader by setting its feed, its queue and the seconds to wait before reconnecting, never if None."""
+        threading.Thread.__init__(self)
+        self.host = host
+        self.port = port
+        self.queue = queue
+        self.reconnect = reconnect
+        self.stopped = False
+        self.error = None
+        self.setDaemon(True)
+
+    def run(self):
+        """Read the feed until it ends, putting its messages in the queue, which is then ended with None."""
+        try:
+            while not self.stopped:
+                try:
+                    feed_socket = socket.create_connection((self.host, self.port))
+                    try:
+                        feed_file = feed_socket.makefile('rb')
+                        for line in feed_file:
+                            if self.stopped:
+                                break
+                            message = parse(line)
+                            if message != None:
+                                self.queue.put(message)
+                    finally:
+                        feed_socket.close()
+                except socket.error, e:
+                    self.error = str(e)
+                if self.reconnect == None:
+                    break
+                time.sleep(self.reconnect)
+        finally:
+            self.queue.put(None)
+
+    def stop(self):
+        """Stop reading the feed, can be called from any thread."""
+        self.stopped = True
+
+
+class Writer(threading.Thread):
+
+    """Class representing a thread writing the messages of a queue to a database."""
+
+    def __init__(self, database_path, queue, interval=config.FLUSH_INTERVAL, size=config.FLUSH_SIZE):
+        """Initialize the writer by setting its database, its queue and how often it writes, in seconds and records."""
+        threading.Thread.__init__(self)
+        self.ingest_controller = business.IngestController(database_path)
+        self.queue = queue
+        self.interval = interval
+        self.size = size
+        self.stopped = False
+        self.error = None
+
+    def run(self):
+        """Write the messages of the queue until it's ended with None."""
+        ingest_controller = self.ingest_controller
+        try:
+            try:
+                deadline = time.time() + self.interval
+                while True:
+                    try:
+                        message = self.queue.get(True, max(0.0, deadline - time.time()))
+                    except Queue.Empty:
+                        message = False
+                    if message == None or self.stopped:
+                        break
+                    if message:
+                        ingest_controller.apply(message)
+                    if time.time() >= deadline or ingest_controller.pending() >= self.size:
+                        ingest_controller.flush()
+                        deadline = time.time() + self.interval
+                ingest_controller.flush(final=True)
+            except business.DatabaseError, e:
+                self.error = e.message
+        finally:
+            ingest_controller.close()
+
+    def stop(self):
+        """Stop writing, once the messages applied are written, can be called from any thread."""
+        self.stopped = True
+
+
+class ReplayServer(threading.Thread):
+
+    """Class representing a server replaying a recorded feed to each client connecting to it."""
+
+    def __init__(self, path, port=0, rate=None):
+        """Initialize the server by listening on the given port, any free one if 0, to replay the given file at the given rate."""
+        threading.Thread.__init__(self)
+        self.path = path
+        self.rate = rate
+        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server_socket.bind(('127.0.0.1', port))
+        self.server_socket.listen(1)
+        self.port = self.server_socket.getsockname()[1]
+        self.setDaemon(True)
+
+    def run(self):
+        """Replay the feed to the clients connecting, one at a time."""
+        while True:
+            client_socket, address = self.server_socket.accept()
+            try:
+                try:
+                    self.replay(client_socket)
+                except socket.error:
+                    pass
+            finally:
+                client_socket.close()
+
+    def replay(self, client_socket):
+        """Send the lines of the recorded feed to the given client."""
+        start = time.time()
+        feed_file = open(self.path, 'rb')
+        try:
+            for number, line in enumerate(feed_file):
+                if self.rate != None:
+                    delay = start + number / float(self.rate) - time.time()
+                    if delay > 0:
+                        time.sleep(delay)
+                client_socket.sendall(line)
+        finally:
+            feed_file.close()
+
+
+def parse(line):
+    """Return the message of the given feed line as a dictionary, None if it's not a valid transmission message."""
+    values = line.rstrip('\r\n').split(',')
+    if len(values) < 22 or values[0] != 'MSG' or len(values[4]) != 6:
+        return None
+    message = {'modes': values[4].upper(), 'time': values[6].replace('/', '-') + ' ' + values[7]}
+    if values[10].strip() != '':
+        message['callsign'] = values[10].strip()
+    if values[17].strip().isdigit():
+        message['squawk'] = int(values[17])
+    message['alert'] = values[18] == '-1'
+    message['emergency'] = values[19] == '-1'
+    message['spi'] = values[20] == '-1'
+    return message
+
+
+def main():
+    option_parser = OptionParser(usage='%prog [options] database')
+    option_parser.add_option('-H', '--host', default='localhost', help='host of the feed [default: %default]')
+    option_parser.add_option('-p', '--port', type='int', default=config.FEED_PORT, help='port of the feed [default: %default]')
+    option_parser.add_option('-r', '--replay', metavar='FILE', help='replay the feed recorded in FILE instead, until it ends')
+    option_parser.add_option('-R', '--rate', type='float', help='lines per second replayed [default: as fast as possible]')
+    option_parser.add_option('-i', '--interval', type='float', default=config.FLUSH_INTERVAL, help='seconds between writes [default: %default]')
+    option_parser.add_option('-j', '--journal', choices=('WAL', 'DELETE', 'TRUNCATE', 'PERSIST', 'keep'), default='WAL',
+                             help='journal mode to switch the database to, WAL lets it be searched while written, keep for its own [default: %default]')
+    option_parser.add_option('-c', '--reconnect', type='float', help='seconds to wait before reconnecting to the feed when it ends [default: never]')
+    options, arguments = option_parser.parse_args()
+    if len(arguments) != 1:
+        option_parser.error('please give the database')
+    if options.journal != 'keep':
+        config.JOURNAL_MODE = options.journal
+    host = options.host
+    port = options.port
+    reconnect = options.reconnect
+    if options.replay != None:
+        replay_server = ReplayServer(options.replay, rate=options.rate)
+        replay_server.start()
+        host = '127.0.0.1'
+        port = replay_server.port
+        reconnect = None
+    queue = Queue.Queue(config.FEED_QUEUE_SIZE)
+    try:
+        writer = Writer(arguments[0], queue, options.interval)
+    except business.DatabaseError, e:
+        sys.stderr.write(e.message + '\n')
+        sys.exit(1)
+    reader = Reader(host, port, queue, reconnect)
+    start = time.time()
+    writer.start()
+    reader.start()
+    try:
+        while writer.isAlive():
+            writer.join(1.0)
+    except KeyboardInterrupt:
+        reader.stop()
+        writer.stop()
+        writer.join()
+    mbiz.pool.close()
+    seconds = time.time() - start
+    count = writer.ingest_controller.count
+    sys.stderr.write(str(count) + ' messages in ' + '%.1f' % seconds + ' seconds, ' + '%.0f' % (count / max(seconds, 0.001)) + ' per second\n')
+    for error in (reader.error, writer.error):
+        if error != None:
+            sys.stderr.write(error + '\n')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+#    Copyright (C) 2008 Vasco Costa <vasco dot costa at geekslot dot com>
+#
+#    This file is part of sbs1explorer.
+#
+#    sbs1explorer is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    sbs1explorer is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Lookup indexes of strings.
+
+This module provides indexes over sets of strings such as the ICAO type codes
+and the countries of the constants module, answering membership in constant
+time and prefix or SQL wildcard matches, which ignore case like the sqlite LIKE
+operator does, in logarithmic time through a sorted array. The indexes of the
+constants are only built, and the constants module only imported, the first
+time they are used.
+
+Classes:
+
+Lookup - class representing a lookup index.
+
+Functions:
+
+expression - return the regular expression of a SQL pattern.
+type_codes - return the lookup index of the ICAO type codes.
+countries - return the lookup index of the countries.
+
+"""
+
+import bisect
+import re
+
+import config
+
+
+class Lookup:
+
+    """Class representing a lookup index of strings."""
+
+    def __init__(self, values=()):
+        """Initialize the index with the given values."""
+        self.values = frozenset()
+        self.index = ([], []) # the lower case keys and the values sorted by key, replaced as a whole when updated
+        self.update(values)
+
+    def __contains__(self, value):
+        """Return True if the given value is in the index."""
+        return value in self.values
+
+    def __len__(self):
+        """Return the number of values in the index."""
+        return len(self.values)
+
+    def update(self, values):
+        """Add the given values to the index, which can meanwhile be read from other threads.
+
+        A few values are inserted one by one, more are sorted along with the index once, so that values are best added
+        in large batches.
+
+        """
+        values = frozenset(values) - self.values
+        if len(values) != 0:
+            keys, sorted_values = self.index
+            if len(values) <= config.LOOKUP_INSERTS and len(values) * 16 < len(keys):
+                keys = list(keys)
+                sorted_values = list(sorted_values)
+                for value in values:
+                    position = bisect.bisect(keys, value.lower())
+                    keys.insert(position, value.lower())
+                    sorted_values.insert(position, value)
+            else:
+                pairs = sorted(zip(keys, sorted_values) + [(value.lower(), value) for value in values])
+                keys = [key for key, value in pairs]
+                sorted_values = [value for key, value in pairs]
+            self.index = (keys, sorted_values)
+            self.values = self.values | values
+
+    def range(self, prefix, keys=None):
+        """Return the start and stop positions of the sorted values starting with the given prefix, ignoring case."""
+        if keys == None:
+            keys = self.index[0]
+        prefix = prefix.lower()
+        start = bisect.bisect_left(keys, prefix)
+        if prefix == '':
+            return start, len(keys)
+        if isinstance(prefix, unicode):
+            successor = prefix[:-1] + unichr(ord(prefix[-1]) + 1)
+        else:
+            successor = prefix[:-1] + chr(min(ord(prefix[-1]) + 1, 255))
+        return start, bisect.bisect_left(keys, successor, start)
+
+    def count(self, prefix):
+        """Return the number of values starting with the given prefix, ignoring case."""
+        start, stop = self.range(prefix)
+        return stop - start
+
+    def prefix(self, prefix, limit=None):
+        """Return, in order, at most limit values starting with the given prefix, ignoring case, all if limit is None."""
+        keys, sorted_values = self.index
+        start, stop = self.range(prefix, keys)
+        if limit != None:
+            stop = min(stop, start + limit)
+        return sorted_values[start:stop]
+
+    def match(self, pattern, limit=None):
+        """Return, in order, at most limit values matching the given SQL pattern with % and _ wildcards, ignoring case."""
+        literal = re.match(r'[^%_]*', pattern).group()
+        pattern_expression = expression(pattern)
+        keys, sorted_values = self.index
+        start, stop = self.range(literal, keys)
+        matches = []
+        for index in range(start, stop):
+            if pattern_expression.match(sorted_values[index]):
+                matches.append(sorted_values[index])
+                if limit != None and len(matches) == limit:
+                    break
+        return matches
+
+    def complete(self, text, limit=config.COMPLETIONS):
+        """Return at most limit completions for the given text, matching it as a pattern if it has wildcards."""
+        if text.find('%') != -1 or text.find('_') != -1:
+            return self.match(text, limit)
+        return self.prefix(text, limit)
+
+
+def expression(pattern):
+    """Return the regular expression matching what the given SQL pattern with % and _ wildcards matches, ignoring case."""
+    return re.compile(''.join([{'%': '.*', '_': '.'}.get(character, re.escape(character)) for character in pattern]) + '$',
+                      re.IGNORECASE | re.DOTALL)
+
+
+def type_codes():
+    """Return the lookup index of the ICAO type codes."""
+    if 'type_codes' not in lookups:
+        import constants
+        lookups['type_codes'] = Lookup(constants.ICAO_TYPE_CODES)
+    return lookups['type_codes']
+
+
+def countries():
+    """Return the lookup index of the countries."""
+    if 'countries' not in lookups:
+        import constants
+        lookups['countries'] = Lookup(constants.COUNTRIES)
+    return lookups['countries']
+
+
+lookups = {}
@@ -49,15 +49,37 @@ Classes:
 
 Model - class representing data objects.
 Controller - class representing business rules.
+Pool - class representing pools of database connections.
+Cache - class representing least recently used caches.
+LogSink - class representing sinks logging the records of executed statements.
+RingSink - class representing sinks keeping the last records of executed statements.
+JsonSink - class representing sinks appending the records of executed statements to files.
 
 Exceptions:
 
 DatabaseError - exception representing database errors.
 
+Functions:
+
+retry - call a function retrying it while the database is locked.
+
+Every statement executed by a model is measured and, if there are any sinks in
+the sinks list, recorded to each of them as a dictionary with its execution and
+fetching times, the number of rows returned, an estimate of the virtual machine
+steps it took and, for slow queries, its query plan.
+
 """
 
+import contextlib
+import itertools
+import json
+import logging
 import os
 import sqlite3
+import threading
+import time
+import urllib
+from collections import OrderedDict, deque
 
 import config
 
@@ -66,10 +88,19 @@ class Model(list):
 
     """Base class for models."""
 
-    def __init__(self, database_path=config.DATABASE_PATH, name=None, child=None, primary_key=None, foreign_key=None, join=config.JOIN):
+    def __init__(self, database_path=config.DATABASE_PATH, name=None, child=None, primary_key=None, foreign_key=None, join=config.JOIN, read_only=False):
         """Initialize the model by connecting to the database and setting sane default values for its attributes."""
-        self.connection = sqlite3.connect(database_path)
+        self.database_path = database_path
+        self.read_only = read_only
+        self.connection = pool.get(database_path, read_only)
+        self.connection.set_progress_handler(lambda: self.progress(), config.PROGRESS_STEPS) # bound methods of a list are unhashable
         self.cursor = self.connection.cursor()
+        self.aborted = False
+        self.steps = 0 # progress handler calls, each after config.PROGRESS_STEPS virtual machine steps
+        self.last_key = None
+        self.depth = 0 # of the transactions entered
+        self.patterns = {} # conditions used instead of LIKE by the constrains with patterns, named parameters as theirs
+        self.shards = () # the aliases of the databases federated with the one of the model
         if name != None:
             self.name = name
         else:
@@ -104,78 +135,386 @@ class Model(list):
 
     def write(self, data):
         """Write a single record to the table corresponding to this model."""
-        sql_statement = "INSERT INTO " + self.name + " (" + self.primary_key + ", " + ", ".join(data.keys()) + ") " +\
-                        "VALUES(NULL, '" + "', '".join(data.values()) + "')"
-        if config.DEBUG:
-            print sql_statement 
-        try:
-            self.cursor.execute(sql_statement)
-            self.connection.commit()
-        except (sqlite3.OperationalError, sqlite3.DatabaseError), e:
-            raise DatabaseError(e.message)
+        self.write_many(data.keys(), [data.values()])
 
     def delete(self, id):
         """Delete a single record from the table corresponding to this model."""
-        sql_statement = "DELETE FROM " + self.name + " WHERE " + self.primary_key + " = " + str(id)
+        self.delete_many([id])
+
+    def write_many(self, fields, rows, table=None, size=config.BATCH_SIZE, ignore=False):
+        """Write records with the given values of the given fields to the table of this model, or the given one, in a single transaction.
+
+        If ignore is True records with the same primary or unique keys as existing ones are skipped instead of failing.
+
+        """
+        statement = "INSERT INTO "
+        if ignore:
+            statement = "INSERT OR IGNORE INTO "
+        self.execute_many(statement + (table or self.name) + " (" + ", ".join(fields) + ") VALUES (" +
+                          ", ".join(["?"] * len(fields)) + ")", rows, size)
+
+    def insert(self, fields, values, table=None):
+        """Write a single record with the given values of the given fields like write does and return the rowid it was given."""
+        sql_statement = "INSERT INTO " + (table or self.name) + " (" + ", ".join(fields) + ") VALUES (" + ", ".join(["?"] * len(fields)) + ")"
+        if config.DEBUG:
+            print sql_statement
+        with self.transaction():
+            try:
+                retry(self.cursor.execute, sql_statement, values)
+            except (sqlite3.OperationalError, sqlite3.DatabaseError), e:
+                raise DatabaseError(e.message)
+            return self.cursor.lastrowid
+
+    def upsert_many(self, fields, rows, table=None, size=config.BATCH_SIZE):
+        """Write records like write_many does, replacing those with the same primary or unique keys."""
+        self.execute_many("INSERT OR REPLACE INTO " + (table or self.name) + " (" + ", ".join(fields) + ") VALUES (" +
+                          ", ".join(["?"] * len(fields)) + ")", rows, size)
+
+    def delete_many(self, ids, table=None, size=config.BATCH_SIZE):
+        """Delete the records with the given primary keys from the table of this model, or the given one, in a single transaction."""
+        self.execute_many("DELETE FROM " + (table or self.name) + " WHERE " + self.primary_key + " = ?", [(id,) for id in ids], size)
+
+    def execute_many(self, sql_statement, rows, size=config.BATCH_SIZE):
+        """Execute the given sql statement for each of the given rows of parameters, size rows at a time, in a single transaction."""
         if config.DEBUG:
             print sql_statement
+        rows = iter(rows)
+        first = True
+        steps = self.steps
+        count = 0
+        start = time.time()
+        with self.transaction():
+            while True:
+                batch = list(itertools.islice(rows, size))
+                if len(batch) == 0:
+                    break
+                if self.aborted:
+                    raise DatabaseError("interrupted")
+                try:
+                    if self.depth == 1 and first: # nothing was written yet, so it can be retried
+                        retry(self.cursor.executemany, sql_statement, batch)
+                    else:
+                        self.cursor.executemany(sql_statement, batch)
+                    first = False
+                except (sqlite3.OperationalError, sqlite3.DatabaseError), e:
+                    raise DatabaseError(e.message)
+                count += len(batch)
+        if len(sinks) != 0:
+            self.record("execute_many", sql_statement, None, time.time() - start, 0.0, count, steps, True)
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Return a context manager running the statements of its block in a transaction, committed or rolled back with the outermost one."""
+        self.depth += 1
         try:
-            self.cursor.execute(sql_statement)
-            self.connection.commit()
-        except (sqlite3.OperationalError, sqlite3.DatabaseError), e:
-            raise DatabaseError(e.message)
+            yield self
+        except:
+            self.depth -= 1
+            if self.depth == 0:
+                self.connection.rollback()
+            raise
+        self.depth -= 1
+        if self.depth == 0:
+            self.commit()
 
     def find(self, fields=None, criteria=None, limit=config.LIMIT):
         """Find a record set from the table(s) corresponding to this model according to the given fields, criteria and limit."""
-        sql_statement = "SELECT "
+        if len(self) != 0:
+            del self[:]
+        for page in self.find_iter(fields, criteria, limit):
+            self.extend(page)
+
+    def find_page(self, fields=None, criteria=None, key=None, after=None, size=config.LIMIT):
+        """Find the page of at most size records after the given value of key, the primary key if None, in key order.
+
+        The value of key for the last record is kept in the last_key attribute so the next page is found by seeking after it.
+
+        """
+        if key == None:
+            key = self.name + "." + self.primary_key
+        if len(self) != 0:
+            del self[:]
+        for page in self.find_iter(fields, criteria, size, config.PAGE_SIZE, key, after):
+            self.extend(page)
+
+    def find_iter(self, fields=None, criteria=None, limit=config.LIMIT, size=config.PAGE_SIZE, key=None, after=None):
+        """Find a record set like find or, if key or after are given, find_page do but yield it in pages of at most size records."""
+        if after != None and key == None:
+            key = self.name + "." + self.primary_key
+        sql_statement = self.select(fields, criteria, limit, key, after)
+        parameters = {}
+        if criteria != None:
+            parameters.update(criteria)
+        if after != None and len(self.shards) != 0:
+            parameters["after"], parameters["after_ordinal"] = after
+        elif after != None:
+            parameters["after"] = after
+        self.last_key = None
+        steps = self.steps
+        fetch_seconds = 0.0
+        count = 0
+        completed = False
+        cursor = self.connection.cursor()
+        try:
+            start = time.time()
+            try:
+                retry(cursor.execute, sql_statement, parameters)
+            except sqlite3.Error, e: # InterfaceError too, for parameters of the wrong type
+                raise DatabaseError(e.message)
+            finally:
+                execute_seconds = time.time() - start
+            if config.DEBUG:
+                print sql_statement
+            while True:
+                start = time.time()
+                try:
+                    page = cursor.fetchmany(size)
+                except sqlite3.Error, e:
+                    raise DatabaseError(e.message)
+                finally:
+                    fetch_seconds += time.time() - start
+                if len(page) == 0:
+                    completed = True
+                    break
+                count += len(page)
+                if self.aborted:
+                    raise DatabaseError("interrupted")
+                if key != None and len(self.shards) != 0:
+                    self.last_key = tuple(page[-1][-2:])
+                    page = [row[:-2] for row in page]
+                elif key != None:
+                    self.last_key = page[-1][-1]
+                    page = [row[:-1] for row in page]
+                yield page
+        finally:
+            cursor.close()
+            if len(sinks) != 0:
+                self.record("find", sql_statement, parameters, execute_seconds, fetch_seconds, count, steps, completed)
+
+    def select(self, fields=None, criteria=None, limit=config.LIMIT, key=None, after=None):
+        """Return the sql statement selecting the given fields according to the given criteria and limit, no limit if None."""
+        shape = self.shape(fields, criteria, limit, key, after)
+        sql_statement = statements.get(shape)
+        if sql_statement == None:
+            sql_statement = self.build(shape)
+            statements.put(shape, sql_statement)
+        return sql_statement
+
+    def shape(self, fields=None, criteria=None, limit=config.LIMIT, key=None, after=None):
+        """Return the shape of the statement select builds, with sorted constrains so that sqlite reuses it compiled."""
         if fields != None:
-            for field in fields:
-                sql_statement += field
-                if field != fields[-1]:
-                    sql_statement += ", "
-        else:
-            sql_statement += "*"
-        sql_statement += " FROM " + self.name
-        if self.child != None:
-            sql_statement += " " + self.join + " " + self.child + " ON " +\
-                                   self.name + "." + self.primary_key + " = " + self.child + "." + self.foreign_key
+            fields = tuple(fields)
+        constrains = None
         if criteria != None:
-            sql_statement += " WHERE "
-            for constrain in criteria.keys():
+            constrains = []
+            for constrain in sorted(criteria.keys()):
                 if criteria[constrain].find("%") != -1 or criteria[constrain].find("_") != -1:
-                    sql_statement += constrain + " LIKE :" + constrain
+                    constrains.append((constrain, "LIKE"))
                 else:
-                    sql_statement += constrain + " = :" + constrain
-                if constrain != criteria.keys()[-1]:
-                    sql_statement += " AND "
-            sql_statement += " LIMIT " + str(limit)
-            try:
-                self.cursor.execute(sql_statement, criteria)
-            except (sqlite3.OperationalError, sqlite3.DatabaseError), e:
-                raise DatabaseError(e.message)
-        else:
+                    constrains.append((constrain, "="))
+            constrains = tuple(constrains)
+        patterns = ()
+        if len(self.shards) == 0: # the patterns only search the database of the model
+            patterns = tuple(sorted([(constrain, self.patterns[constrain]) for constrain, operator in constrains or ()
+                                     if operator == "LIKE" and constrain in self.patterns]))
+        return (self.name, self.child, self.join, self.primary_key, self.foreign_key, fields, constrains, patterns, limit, key, after != None,
+                self.shards)
+
+    def build(self, shape):
+        """Build the sql statement of the given shape, the UNION ALL of the statements of every database if federated."""
+        name, child, join, primary_key, foreign_key, fields, constrains, patterns, limit, key, seek, shards = shape
+        patterns = dict(patterns)
+        def member(schema, ordinal):
+            sql_statement = "SELECT "
+            if fields != None:
+                sql_statement += ", ".join(fields)
+            else:
+                sql_statement += "*"
+            if key != None and schema != None:
+                sql_statement += ", " + key + " AS sort_key, " + str(ordinal) + " AS sort_ordinal"
+            elif key != None:
+                sql_statement += ", " + key
+            if schema != None:
+                sql_statement += " FROM " + schema + "." + name + " AS " + name
+            else:
+                sql_statement += " FROM " + name
+            if child != None and schema != None:
+                sql_statement += " " + join + " " + schema + "." + child + " AS " + child
+            elif child != None:
+                sql_statement += " " + join + " " + child
+            if child != None:
+                sql_statement += " ON " + name + "." + primary_key + " = " + child + "." + foreign_key
+            conditions = []
+            if constrains != None:
+                for constrain, operator in constrains:
+                    if constrain in patterns:
+                        conditions.append(patterns[constrain])
+                    else:
+                        conditions.append(constrain + " " + operator + " :" + constrain)
+            if seek and schema != None:
+                conditions.append(key + " >= :after AND (" + key + " > :after OR " + str(ordinal) + " > :after_ordinal)")
+            elif seek:
+                conditions.append(key + " > :after")
+            if len(conditions) != 0:
+                sql_statement += " WHERE " + " AND ".join(conditions)
+            if key != None:
+                sql_statement += " ORDER BY " + key
+            if limit != None:
+                sql_statement += " LIMIT " + str(limit)
+            return sql_statement
+        if len(shards) == 0:
+            return member(None, None)
+        sql_statement = " UNION ALL ".join(["SELECT * FROM (" + member(schema, ordinal) + ")"
+                                            for schema, ordinal in zip(("main",) + shards, range(len(shards) + 1))])
+        if key != None:
+            sql_statement += " ORDER BY sort_key, sort_ordinal"
+        if limit != None:
             sql_statement += " LIMIT " + str(limit)
-            try:
-                self.cursor.execute(sql_statement)
-            except (sqlite3.OperationalError, sqlite3.DatabaseError), e:
-                raise DatabaseError(e.message)
+        return sql_statement
+
+    def explain(self, fields=None, criteria=None, limit=config.LIMIT, key=None):
+        """Return the details of the query plan of the statement find, or find_page if key is given, would execute for the first page."""
+        try:
+            if criteria != None:
+                self.cursor.execute("EXPLAIN QUERY PLAN " + self.select(fields, criteria, limit, key), criteria)
+            else:
+                self.cursor.execute("EXPLAIN QUERY PLAN " + self.select(fields, criteria, limit, key))
+        except (sqlite3.OperationalError, sqlite3.DatabaseError), e:
+            raise DatabaseError(e.message)
+        return [row[-1] for row in self.cursor]
+
+    def columns(self, table):
+        """Return the lower case names of the columns of the given table."""
+        try:
+            self.cursor.execute("PRAGMA table_info(" + table + ")")
+        except (sqlite3.OperationalError, sqlite3.DatabaseError), e:
+            raise DatabaseError(e.message)
+        return [row[1].lower() for row in self.cursor]
+
+    def indexed(self, table, column):
+        """Return True if the given column is the primary key or the first column of an index of the given table."""
+        try:
+            self.cursor.execute("PRAGMA table_info(" + table + ")")
+            for row in self.cursor.fetchall():
+                if row[1].lower() == column.lower() and row[5] == 1 and row[2].upper() == "INTEGER":
+                    return True
+            self.cursor.execute("PRAGMA index_list(" + table + ")")
+            for row in self.cursor.fetchall():
+                self.cursor.execute("PRAGMA index_info(" + row[1] + ")")
+                for index_row in self.cursor.fetchall():
+                    if index_row[0] == 0 and index_row[2] != None and index_row[2].lower() == column.lower():
+                        return True
+        except (sqlite3.OperationalError, sqlite3.DatabaseError), e:
+            raise DatabaseError(e.message)
+        return False
+
+    def create_index(self, table, column):
+        """Create an index on the given column of the given table unless it already exists."""
+        sql_statement = "CREATE INDEX IF NOT EXISTS " + table + "_" + column + "_index ON " + table + " (" + column + ")"
         if config.DEBUG:
             print sql_statement
-        if len(self) != 0:
-            del self[:]
-        for row in self.cursor:
-            self.append(row)
+        try:
+            self.cursor.execute(sql_statement)
+            self.connection.commit()
+        except (sqlite3.OperationalError, sqlite3.DatabaseError), e:
+            raise DatabaseError(e.message)
+
+    def attach(self, database_path, alias):
+        """Attach the given database to the connection of the model under the given alias unless it already is."""
+        try:
+            self.cursor.execute("PRAGMA database_list")
+            attached = dict([(row[1], row[2]) for row in self.cursor.fetchall()])
+            if alias in attached and attached[alias] != os.path.abspath(database_path):
+                self.cursor.execute("DETACH DATABASE " + alias)
+                del attached[alias]
+            if alias not in attached:
+                self.cursor.execute("ATTACH DATABASE ? AS " + alias, (os.path.abspath(database_path),))
+        except (sqlite3.OperationalError, sqlite3.DatabaseError), e:
+            raise DatabaseError(e.message)
+
+    def federate(self, database_paths):
+        """Attach the given databases so that find and the like search them along with the one of the model.
+
+        The records of every database are merged in key order, ties broken by the order of the databases, so the last key of
+        a page is a (key, database ordinal) tuple. Sqlite attaches at most 10 databases unless compiled otherwise.
+
+        """
+        shards = []
+        for database_path in database_paths:
+            shards.append("shard" + str(len(shards) + 1))
+            self.attach(database_path, shards[-1])
+        self.shards = tuple(shards)
+
+    def commit(self):
+        """Commit the changes made through raw sql statements."""
+        try:
+            retry(self.connection.commit)
+        except (sqlite3.OperationalError, sqlite3.DatabaseError), e:
+            raise DatabaseError(e.message)
 
     def raw_sql(self, sql_statement):
         """Execute a raw sql statement."""
+        steps = self.steps
+        start = time.time()
         try:
-            self.cursor.execute(sql_statement)
+            retry(self.cursor.execute, sql_statement)
         except (sqlite3.OperationalError, sqlite3.DatabaseError), e:
             raise DatabaseError(e.message)
+        execute_seconds = time.time() - start
         if len(self) != 0:
             del self[:]
         for row in self.cursor:
             self.append(row)
+        if len(sinks) != 0:
+            self.record("raw_sql", sql_statement, None, execute_seconds, time.time() - start - execute_seconds, len(self), steps, True)
+
+    def record(self, operation, sql_statement, parameters, execute_seconds, fetch_seconds, rows, steps, completed):
+        """Write the measures of an executed statement to the sinks, along with its query plan if it was slow."""
+        record = {"time": time.time(),
+                  "thread": threading.currentThread().getName(),
+                  "database": self.database_path,
+                  "operation": operation,
+                  "statement": sql_statement,
+                  "parameters": parameters,
+                  "execute_seconds": execute_seconds,
+                  "fetch_seconds": fetch_seconds,
+                  "rows": rows,
+                  "steps": (self.steps - steps) * config.PROGRESS_STEPS,
+                  "completed": completed}
+        if completed and config.SLOW_QUERY != None and execute_seconds + fetch_seconds >= config.SLOW_QUERY and\
+           sql_statement.lstrip().upper().startswith("SELECT") and self.connection != None:
+            try:
+                record["plan"] = [row[-1] for row in self.connection.execute("EXPLAIN QUERY PLAN " + sql_statement, parameters or {})]
+            except (sqlite3.OperationalError, sqlite3.DatabaseError):
+                pass
+        for sink in sinks:
+            sink.write(record)
+
+    def progress(self):
+        """Return True, interrupting the statement being executed, if the model was aborted."""
+        self.steps += 1
+        return self.aborted
+
+    def abort(self):
+        """Abort the statement being executed and any further one, can be called from any thread."""
+        self.aborted = True
+        if self.connection != None:
+            self.connection.interrupt()
+
+    def close(self):
+        """Close the model by giving its connection back to the pool."""
+        if self.connection != None:
+            connection = self.connection
+            self.connection = None
+            for shard in self.shards:
+                try:
+                    self.cursor.execute("DETACH DATABASE " + shard)
+                except (sqlite3.OperationalError, sqlite3.DatabaseError):
+                    pass
+            self.cursor.close()
+            connection.set_progress_handler(None, 0)
+            connection.rollback()
+            pool.put(self.database_path, self.read_only, connection)
 
 
 class Controller:
@@ -190,6 +529,211 @@ class Controller:
         """Set the given attribute of a given object to the given value."""
         setattr(object, attribute, value)
 
+    def abort(self):
+        """Abort the work in progress on the model of the controller."""
+        self.model.abort()
+
+    def close(self):
+        """Close the controller by closing its model."""
+        self.model.close()
+
+
+class Pool:
+
+    """Class representing a pool of connections per database path."""
+
+    def __init__(self, size=config.POOL_SIZE):
+        """Initialize the pool by setting the number of idle connections kept per database."""
+        self.size = size
+        self.connections = {}
+        self.lock = threading.Lock()
+
+    def get(self, database_path, read_only=False):
+        """Get a connection to the given database from the pool, opening a new one if there's none idle."""
+        key = (os.path.abspath(database_path), read_only)
+        self.lock.acquire()
+        try:
+            if len(self.connections.get(key, [])) != 0:
+                return self.connections[key].pop()
+        finally:
+            self.lock.release()
+        return self.connect(database_path, read_only)
+
+    def put(self, database_path, read_only, connection):
+        """Put a connection got from the pool back into it, closing it if the pool is full."""
+        key = (os.path.abspath(database_path), read_only)
+        self.lock.acquire()
+        try:
+            connections = self.connections.setdefault(key, [])
+            if len(connections) < self.size:
+                connections.append(connection)
+                return
+        finally:
+            self.lock.release()
+        connection.close()
+
+    def close(self):
+        """Close the idle connections of the pool, so that databases in WAL mode are checkpointed."""
+        self.lock.acquire()
+        try:
+            connections = self.connections
+            self.connections = {}
+        finally:
+            self.lock.release()
+        for key in connections:
+            for connection in connections[key]:
+                connection.close()
+
+    def connect(self, database_path, read_only=False):
+        """Open a connection to the given database, read-only ones only to existing files and through an URI when supported.
+
+        Read-only connections to immutable databases don't lock them at all, others wait config.BUSY_TIMEOUT seconds for
+        the locks of other connections, and writable ones switch the database to config.JOURNAL_MODE, so that in WAL mode
+        readers and the writer don't block each other.
+
+        """
+        try:
+            if read_only:
+                if not os.path.isfile(database_path): # rather than create it when falling back below
+                    raise DatabaseError("unable to open database file")
+                if config.IMMUTABLE:
+                    parameters = "?immutable=1"
+                else:
+                    parameters = "?mode=ro"
+                try:
+                    connection = sqlite3.connect("file:" + urllib.pathname2url(os.path.abspath(database_path)) + parameters, timeout=config.BUSY_TIMEOUT,
+                                                 check_same_thread=False, cached_statements=config.STATEMENT_CACHE_SIZE)
+                except sqlite3.OperationalError: # URIs unsupported, the path was taken as a file in a "file:" directory
+                    connection = sqlite3.connect(database_path, timeout=config.BUSY_TIMEOUT, check_same_thread=False,
+                                                 cached_statements=config.STATEMENT_CACHE_SIZE)
+                connection.execute("PRAGMA query_only = ON")
+            else:
+                connection = sqlite3.connect(database_path, timeout=config.BUSY_TIMEOUT, check_same_thread=False,
+                                             cached_statements=config.STATEMENT_CACHE_SIZE)
+                if config.JOURNAL_MODE != None:
+                    retry(connection.execute, "PRAGMA journal_mode = " + config.JOURNAL_MODE)
+        except (sqlite3.OperationalError, sqlite3.DatabaseError), e:
+            raise DatabaseError(e.message)
+        return connection
+
+
+class Cache:
+
+    """Class representing a thread safe least recently used cache."""
+
+    def __init__(self, size, weigh=None):
+        """Initialize the cache by setting its size and the function weighing its values, which counts entries if None."""
+        self.size = size
+        if weigh != None:
+            self.weigh = weigh
+        else:
+            self.weigh = lambda value: 1
+        self.weight = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Get the value cached for the given key, making it the most recently used, or the default if there's none."""
+        self.lock.acquire()
+        try:
+            if key not in self.entries:
+                return default
+            entry = self.entries.pop(key)
+            self.entries[key] = entry
+            return entry[0]
+        finally:
+            self.lock.release()
+
+    def put(self, key, value, weight=None):
+        """Put the given value, weighed unless its weight is given, in the cache for the given key evicting if it's full."""
+        if weight == None:
+            weight = self.weigh(value)
+        if weight > self.size:
+            return
+        self.lock.acquire()
+        try:
+            if key in self.entries:
+                self.weight -= self.entries.pop(key)[1]
+            self.entries[key] = (value, weight)
+            self.weight += weight
+            while self.weight > self.size:
+                self.weight -= self.entries.popitem(last=False)[1][1]
+        finally:
+            self.lock.release()
+
+    def remove(self, test):
+        """Remove the entries whose key passes the given test."""
+        self.lock.acquire()
+        try:
+            for key in [key for key in self.entries if test(key)]:
+                self.weight -= self.entries.pop(key)[1]
+        finally:
+            self.lock.release()
+
+    def clear(self):
+        """Remove all the entries from the cache."""
+        self.lock.acquire()
+        try:
+            self.entries.clear()
+            self.weight = 0
+        finally:
+            self.lock.release()
+
+
+class LogSink:
+
+    """Class representing a sink writing the records of executed statements to a logger."""
+
+    def __init__(self, logger=None, level=logging.INFO):
+        """Initialize the sink by setting its logger, the mbiz one if None, and the level it logs at."""
+        self.logger = logger or logging.getLogger("mbiz")
+        self.level = level
+
+    def write(self, record):
+        """Log the given record as a JSON object."""
+        self.logger.log(self.level, "%s", json.dumps(record, sort_keys=True, default=repr))
+
+
+class RingSink:
+
+    """Class representing a sink keeping the last records of executed statements in memory."""
+
+    def __init__(self, size=config.TRACE_SIZE):
+        """Initialize the sink by setting the number of records it keeps."""
+        self.records = deque(maxlen=size)
+
+    def write(self, record):
+        """Keep the given record, dropping the oldest one if the sink is full."""
+        self.records.append(record)
+
+    def read(self):
+        """Return the records kept, oldest first."""
+        return list(self.records)
+
+
+class JsonSink:
+
+    """Class representing a sink appending the records of executed statements to a file as JSON lines."""
+
+    def __init__(self, path):
+        """Initialize the sink by opening its file."""
+        self.file = open(path, "a")
+        self.lock = threading.Lock()
+
+    def write(self, record):
+        """Append the given record to the file."""
+        line = json.dumps(record, sort_keys=True, default=repr) + "\n"
+        self.lock.acquire()
+        try:
+            self.file.write(line)
+            self.file.flush()
+        finally:
+            self.lock.release()
+
+    def close(self):
+        """Close the file of the sink."""
+        self.file.close()
+
 
 class DatabaseError(Exception):
 
@@ -202,3 +746,20 @@ class DatabaseError(Exception):
     def __str___(self):
         """Rerturn the string representation of the exception."""
         return repr(self.message)
+
+
+def retry(function, *arguments):
+    """Return the result of calling the given function, retrying it config.RETRIES times while the database is locked."""
+    for attempt in range(config.RETRIES):
+        try:
+            return function(*arguments)
+        except sqlite3.OperationalError, e:
+            if not e.message.startswith("database is locked"):
+                raise
+        time.sleep(config.RETRY_DELAY * 2 ** attempt)
+    return function(*arguments)
+
+
+pool = Pool()
+statements = Cache(config.STATEMENT_CACHE_SIZE)
+sinks = []
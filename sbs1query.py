@@ -0,0 +1,283 @@
+#    Copyright (C) 2008 Vasco Costa <vasco dot costa at geekslot dot com>
+#
+#    This file is part of sbs1explorer.
+#
+#    sbs1explorer is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    sbs1explorer is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Command line interface of the application.
+
+This module runs searches on a flights database without any GUI, so that they
+can be run on servers without a display. A single search is given through the
+options named after the fields of the main window, many searches can be given
+in a file with one JSON object per line using either the option names or the
+database fields as keys, those are run concurrently. The results are streamed
+to the standard output as CSV or JSON Lines. Searches are answered from a
+columnar snapshot of the database when one is up to date, which the --snapshot
+option builds, and pattern searches through the full text index the --fulltext
+option updates.
+
+Several databases, or a directory or glob pattern of them, are searched at
+once as an archive, their results merged by start time. The --statistics
+option outputs the counts of the flights per country, operator, type, day and
+hour instead, updated since the last time they were output, and the --rollup
+option the flights per day and per hour, summed as they are added.
+
+Usage: python sbs1query.py [options] [database ...]
+
+"""
+
+import csv
+import glob
+import json
+import os
+import sys
+import threading
+import Queue
+from optparse import OptionParser
+
+import business
+import config
+import mbiz
+
+
+OPTIONS = (('squawk', 'firstsquawk'),
+           ('callsign', 'callsign'),
+           ('alert', 'hadalert'),
+           ('emergency', 'hademergency'),
+           ('spi', 'hadspi'),
+           ('modes', 'modes'),
+           ('registration', 'registration'),
+           ('type', 'icaotypecode'),
+           ('operator', 'operatorflagcode'),
+           ('country', 'modescountry'))
+
+
+class Writer:
+
+    """Class writing the results of many searches to a stream, one page at a time."""
+
+    def __init__(self, stream, format, numbered):
+        """Initialize the writer by setting its stream, its format and whether the searches are numbered."""
+        self.stream = stream
+        self.format = format
+        self.numbered = numbered
+        self.lock = threading.Lock()
+        self.csv_writer = csv.writer(stream)
+        if format == 'csv':
+            if numbered:
+                self.csv_writer.writerow(('query',) + business.AircraftController.fields)
+            else:
+                self.csv_writer.writerow(business.AircraftController.fields)
+
+    def write(self, number, page):
+        """Write the given page of results of the search with the given number."""
+        self.lock.acquire()
+        try:
+            for row in page:
+                if self.format == 'csv':
+                    row = [self.encode(value) for value in row]
+                    if self.numbered:
+                        row.insert(0, number)
+                    self.csv_writer.writerow(row)
+                else:
+                    record = dict(zip(business.AircraftController.fields, row))
+                    if self.numbered:
+                        record['query'] = number
+                    self.stream.write(json.dumps(record, sort_keys=True) + '\n')
+            self.stream.flush()
+        finally:
+            self.lock.release()
+
+    def encode(self, value):
+        """Return the given value encoded for the csv module."""
+        if isinstance(value, unicode):
+            return value.encode('utf-8')
+        return value
+
+
+def search(database_paths, number, data, writer, follow):
+    """Run the search of the given data, and of its following pages if follow is True, writing its results."""
+    if len(database_paths) == 1:
+        aircraft_controller = business.AircraftController(database_paths[0])
+    else:
+        aircraft_controller = business.ArchiveController(database_paths)
+    try:
+        after = None
+        while True:
+            for page in aircraft_controller.search_iter(data, after=after):
+                writer.write(number, page)
+            if not follow or not aircraft_controller.more:
+                break
+            after = aircraft_controller.last_key
+    finally:
+        aircraft_controller.close()
+
+
+def work(database_paths, queue, writer, follow, errors):
+    """Run the searches taken from the given queue until it's empty."""
+    while True:
+        try:
+            number, data = queue.get_nowait()
+        except Queue.Empty:
+            return
+        try:
+            search(database_paths, number, data, writer, follow)
+        except business.DatabaseError, e:
+            sys.stderr.write('query ' + str(number) + ': ' + e.message + '\n')
+            errors.append(number)
+
+
+def parse(line):
+    """Return the search data of the given JSON object of strings or numbers, using either option names or fields as keys."""
+    names = dict(OPTIONS)
+    data = {}
+    search = json.loads(line)
+    if not isinstance(search, dict):
+        raise ValueError('not a JSON object')
+    for key, value in search.items():
+        if isinstance(value, bool):
+            value = int(value)
+        if not isinstance(value, (basestring, int, long, float)):
+            raise ValueError('not a string or number for ' + key)
+        data[names.get(key, key)] = unicode(value)
+    for key in data:
+        if key not in names.values():
+            raise ValueError('unknown field ' + key)
+    return data
+
+
+def main():
+    option_parser = OptionParser(usage='%prog [options] [database ...]')
+    for name, field in OPTIONS:
+        option_parser.add_option('--' + name, default='', help='search the ' + field + ' field, SQL wildcards like % and _ allowed')
+    option_parser.add_option('-f', '--file', help='read the searches from FILE, one JSON object per line, - for standard input')
+    option_parser.add_option('-F', '--format', choices=('csv', 'jsonl'), default='csv', help='output format, csv or jsonl [default: %default]')
+    option_parser.add_option('-j', '--jobs', type='int', default=4, help='number of searches run concurrently [default: %default]')
+    option_parser.add_option('-a', '--all', action='store_true', default=False, help='output every page of results, not only the first ' + str(config.LIMIT))
+    option_parser.add_option('-s', '--snapshot', action='store_true', default=False, help='build the columnar snapshot searches are answered from and exit')
+    option_parser.add_option('-T', '--trace', metavar='FILE', help='append the timings of every statement executed to FILE as JSON lines')
+    option_parser.add_option('-A', '--attach', action='store_true', default=False, help='search several databases by attaching them to a single connection')
+    option_parser.add_option('-i', '--immutable', action='store_true', default=False, help='read the database without locking it, only for static copies')
+    option_parser.add_option('-t', '--fulltext', action='store_true', default=False, help='update the full text index pattern searches use and exit')
+    option_parser.add_option('-S', '--statistics', action='store_true', default=False, help='output the statistics of each database as JSON lines and exit')
+    option_parser.add_option('-r', '--rollup', action='store_true', default=False, help='output the flights of each database per day and per hour as JSON lines and exit')
+    options, arguments = option_parser.parse_args()
+    database_paths = []
+    for argument in arguments:
+        if os.path.isdir(argument) or glob.has_magic(argument):
+            database_paths.extend(business.archive(argument))
+        else:
+            database_paths.append(argument)
+    if len(arguments) == 0:
+        database_paths.append(config.DATABASE_PATH)
+    elif len(database_paths) == 0:
+        option_parser.error('no databases found')
+    config.IMMUTABLE = options.immutable
+    config.FEDERATE = options.attach
+    if options.trace != None:
+        mbiz.sinks.append(mbiz.JsonSink(options.trace))
+    if options.snapshot:
+        for database_path in database_paths:
+            try:
+                aircraft_controller = business.AircraftController(database_path)
+                try:
+                    aircraft_controller.build_snapshot()
+                finally:
+                    aircraft_controller.close()
+            except business.DatabaseError, e:
+                sys.stderr.write(database_path + ': ' + e.message + '\n')
+                sys.exit(1)
+        return
+    if options.fulltext:
+        for database_path in database_paths:
+            try:
+                full_text_controller = business.FullTextController(database_path)
+                try:
+                    for table in full_text_controller.update():
+                        pass
+                finally:
+                    full_text_controller.close()
+            except business.DatabaseError, e:
+                sys.stderr.write(database_path + ': ' + e.message + '\n')
+                sys.exit(1)
+        return
+    if options.statistics:
+        for database_path in database_paths:
+            try:
+                statistics_controller = business.StatisticsController(database_path)
+                try:
+                    for count in statistics_controller.update():
+                        pass
+                    summary = statistics_controller.summary()
+                finally:
+                    statistics_controller.close()
+            except business.DatabaseError, e:
+                sys.stderr.write(database_path + ': ' + e.message + '\n')
+                sys.exit(1)
+            summary['database'] = database_path
+            sys.stdout.write(json.dumps(summary, sort_keys=True) + '\n')
+        return
+    if options.rollup:
+        for database_path in database_paths:
+            try:
+                rollup_controller = business.RollupController(database_path)
+                try:
+                    for mark in rollup_controller.update():
+                        pass
+                    rollup = {'database': database_path, 'days': rollup_controller.daily(), 'hours': rollup_controller.hourly()}
+                finally:
+                    rollup_controller.close()
+            except business.DatabaseError, e:
+                sys.stderr.write(database_path + ': ' + e.message + '\n')
+                sys.exit(1)
+            sys.stdout.write(json.dumps(rollup, sort_keys=True) + '\n')
+        return
+    searches = []
+    if options.file != None:
+        if options.file == '-':
+            lines = sys.stdin.readlines()
+        else:
+            lines = open(options.file).readlines()
+        for number, line in zip(range(1, len(lines) + 1), lines):
+            if line.strip() != '':
+                try:
+                    searches.append(parse(line))
+                except ValueError, e:
+                    option_parser.error(options.file + ' line ' + str(number) + ': ' + str(e))
+    else:
+        data = {}
+        for name, field in OPTIONS:
+            data[field] = getattr(options, name).decode(sys.getfilesystemencoding() or 'utf-8')
+        if len([value for value in data.values() if value != '']) == 0:
+            option_parser.error('please be more specific')
+        searches.append(data)
+    writer = Writer(sys.stdout, options.format, options.file != None)
+    queue = Queue.Queue()
+    for number, data in zip(range(1, len(searches) + 1), searches):
+        queue.put((number, data))
+    errors = []
+    workers = []
+    for index in range(max(1, min(options.jobs, len(searches)))):
+        worker = threading.Thread(target=work, args=(database_paths, queue, writer, options.all, errors))
+        worker.start()
+        workers.append(worker)
+    for worker in workers:
+        worker.join()
+    if len(errors) != 0:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()